@@ -0,0 +1,117 @@
+import numpy as np
+
+from macro_plan import Plan
+from macro_store import load_columns, save_columns, save_events, columns_to_events, is_binary, edits_mtime, MOUSE_CLICK
+from macro_grouping import group_columns
+
+DEFAULT_IDLE_THRESHOLD = 2.0  # seconds without input that count as idle
+
+def _times(records): return np.asarray(records['time'], dtype=np.float64)
+
+def idle_gaps(records, threshold_s=DEFAULT_IDLE_THRESHOLD):
+    """Returns (indices, seconds) of gaps longer than threshold_s; index i is the gap before event i."""
+    gaps = np.diff(_times(records))
+    index = np.flatnonzero(gaps > threshold_s)
+    return index + 1, gaps[index]
+
+def capped_times(times, cap_s):
+    """Timestamps with every gap longer than cap_s shortened to cap_s; the first timestamp is kept."""
+    times = np.asarray(times, dtype=np.float64)
+    if len(times) < 2: return times.copy()
+    return times[0] + np.concatenate(([0.0], np.cumsum(np.minimum(np.diff(times), cap_s))))
+
+def projected_duration(records, cap_s):
+    """Returns (duration, duration with idle gaps capped at cap_s) in seconds."""
+    times = _times(records)
+    if len(times) < 2: return 0.0, 0.0
+    return float(times[-1] - times[0]), float(np.minimum(np.diff(times), cap_s).sum())
+
+def events_per_second(records, bin_s=1.0):
+    """Event counts per bin_s window from the first event, as a float array of events/sec."""
+    times = _times(records)
+    if len(times) == 0: return np.zeros(0)
+    return np.bincount(((times - times[0]) // bin_s).astype(np.int64)) / bin_s
+
+def click_clusters(records, radius_px=20):
+    """Groups mouse presses on a radius_px grid. Returns [(x, y, clicks)], busiest first, x/y the mean position."""
+    presses = (records['type'] == MOUSE_CLICK) & (records['pressed'] == 1)
+    xs, ys = records['x'][presses].astype(np.int64), records['y'][presses].astype(np.int64)
+    if len(xs) == 0: return []
+    cells = (xs // radius_px) * (1 << 32) + (ys // radius_px)
+    _, cluster, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    cx = np.bincount(cluster, weights=xs) / counts
+    cy = np.bincount(cluster, weights=ys) / counts
+    order = np.argsort(-counts, kind="stable")
+    return [(int(round(cx[i])), int(round(cy[i])), int(counts[i])) for i in order]
+
+def action_durations(records, rows):
+    """Total seconds spent in each kind of grouped action row, from the rows' event ranges."""
+    if not rows: return {}
+    times = _times(records)
+    starts = np.fromiter((row[3] for row in rows), np.int64, len(rows))
+    ends = np.fromiter((row[4] for row in rows), np.int64, len(rows))
+    spans = times[ends - 1] - times[starts]
+    actions = [row[0] for row in rows]
+    kinds, kind_index = np.unique(actions, return_inverse=True)
+    totals = np.bincount(kind_index, weights=spans, minlength=len(kinds))
+    return {str(kind): float(total) for kind, total in zip(kinds, totals)}
+
+def analyze(records, names, idle_threshold_s=DEFAULT_IDLE_THRESHOLD, cap_s=None):
+    """Timeline summary of a macro: idle gaps, event rate, click clusters and time per action kind."""
+    cap_s = idle_threshold_s if cap_s is None else cap_s
+    gap_index, gap_seconds = idle_gaps(records, idle_threshold_s)
+    rate = events_per_second(records)
+    duration, capped = projected_duration(records, cap_s)
+    return {
+        'events': len(records),
+        'duration_s': duration,
+        'idle_gaps': len(gap_index),
+        'idle_s': float(gap_seconds.sum()),
+        'longest_gap_s': float(gap_seconds.max()) if len(gap_seconds) else 0.0,
+        'capped_duration_s': capped,
+        'cap_s': cap_s,
+        'mean_events_per_s': len(records) / duration if duration else 0.0,
+        'peak_events_per_s': float(rate.max()) if len(rate) else 0.0,
+        'click_clusters': click_clusters(records)[:10],
+        'action_seconds': action_durations(records, group_columns(records, names)),
+    }
+
+def format_analysis(summary):
+    lines = [f"{summary['events']} events over {summary['duration_s']:.1f}s "
+             f"({summary['mean_events_per_s']:.0f}/s average, {summary['peak_events_per_s']:.0f}/s peak)",
+             f"{summary['idle_gaps']} idle gaps, {summary['idle_s']:.1f}s in total, longest {summary['longest_gap_s']:.1f}s",
+             f"Playback time {summary['duration_s']:.1f}s, {summary['capped_duration_s']:.1f}s with gaps capped at {summary['cap_s']:g}s",
+             "", "Time per action:"]
+    lines += [f"  {action}: {seconds:.2f}s" for action, seconds in sorted(summary['action_seconds'].items(), key=lambda item: -item[1])]
+    lines += ["", "Click hot spots:"]
+    lines += [f"  ({x}, {y}): {clicks} clicks" for x, y, clicks in summary['click_clusters']] or ["  none"]
+    return "\n".join(lines)
+
+def load_for_analysis(file_path):
+    if edits_mtime(file_path):
+        from macro_edits import load_edited_columns
+        return load_edited_columns(file_path)
+    return load_columns(file_path)
+
+def cap_plan_idle(plan, cap_s):
+    """Returns plan with every gap between steps longer than cap_s shortened to cap_s."""
+    steps = plan.steps
+    if not cap_s or cap_s <= 0 or len(steps) < 2: return plan
+    offsets = np.fromiter((step[0] for step in steps), np.int64, len(steps))
+    capped = np.concatenate(([0], np.cumsum(np.minimum(np.diff(offsets), int(cap_s * 1e9))))) + offsets[0]
+    return Plan([(offset,) + step[1:] for offset, step in zip(capped.tolist(), steps)])
+
+def cap_idle_file(file_path, cap_s):
+    """Caps idle gaps of a saved macro in place. Returns seconds removed from its playback time.
+
+    Like cap_plan_idle(), a cap that is not positive means no cap and leaves the file alone.
+    """
+    if not cap_s or cap_s <= 0: return 0.0
+    records, names = load_columns(file_path)
+    duration, capped = projected_duration(records, cap_s)
+    if duration - capped <= 0: return 0.0
+    records = np.array(records)  # copies, releasing the memory map before the file is replaced
+    records['time'] = capped_times(records['time'], cap_s)
+    if is_binary(file_path): save_columns(file_path, records, names)
+    else: save_events(file_path, columns_to_events(records, names))
+    return duration - capped
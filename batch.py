@@ -0,0 +1,273 @@
+"""Folder-wide macro maintenance spread across a process pool.
+
+Each file is handled by a worker on its own and every failure is caught per file, so one
+corrupt macro shows up in the report instead of stopping the run. Files are handed out in
+chunks, largest first, to keep the workers busy until the end.
+"""
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from macro_store import (load_events, save_events, load_columns, save_columns, convert_macro, edits_mtime, find_macro_file,
+                         is_binary, EVENT_TYPES, MACRO_EXTS, BINARY_EXT, KEY_PRESS, KEY_RELEASE, MOUSE_CLICK)
+from composition import load_composition, referenced_macros, is_composition, COMPOSITION_EXT
+
+OPERATIONS = ("validate", "normalize", "convert", "simplify", "reindex")
+MAX_PROBLEMS = 20  # per file; the rest are only counted
+CHUNK_FILES = 16
+
+KEY_NAME = re.compile(r"^('.+'|Key\.\w+|<\d+>)$")
+BUTTON_NAME = re.compile(r"^Button\.\w+$")
+_special_keys = False
+
+def _known_special_keys():
+    """Names in pynput's Key enum, or None where pynput cannot be imported (e.g. no display)."""
+    global _special_keys
+    if _special_keys is False:
+        try:
+            from pynput.keyboard import Key
+            _special_keys = {key.name for key in Key}
+        except Exception:
+            _special_keys = None
+    return _special_keys
+
+def _check_key(name, where, problems):
+    if not isinstance(name, str) or not KEY_NAME.match(name): problems.append(f"{where}: bad key name {name!r}")
+    elif name.startswith("Key."):
+        known = _known_special_keys()
+        if known is not None and name[4:] not in known: problems.append(f"{where}: unknown key {name!r}")
+
+def _check_button(name, where, problems):
+    if not isinstance(name, str) or not BUTTON_NAME.match(name): problems.append(f"{where}: bad button name {name!r}")
+
+def _is_number(value): return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+DATA_SHAPES = {'key_press': 1, 'key_release': 1, 'mouse_move': 2, 'mouse_click': 4, 'mouse_scroll': 4}
+
+def validate_events(events):
+    """Schema, timestamp and name checks for a list of event dicts. Returns a list of problems."""
+    if not isinstance(events, list): return ["'actions' is not a list"]
+    problems, last_time = [], None
+    for i, event in enumerate(events):
+        where = f"event {i}"
+        if not isinstance(event, dict) or not {'time', 'type', 'data'} <= event.keys():
+            problems.append(f"{where}: needs time, type and data"); continue
+        t, kind, data = event['time'], event['type'], event['data']
+        if not _is_number(t): problems.append(f"{where}: time is not a number")
+        else:
+            if last_time is not None and t < last_time: problems.append(f"{where}: time goes backwards ({t} < {last_time})")
+            last_time = t
+        if kind not in DATA_SHAPES: problems.append(f"{where}: unknown type {kind!r}"); continue
+        if not isinstance(data, list) or len(data) != DATA_SHAPES[kind]:
+            problems.append(f"{where}: {kind} needs {DATA_SHAPES[kind]} data values"); continue
+        if kind in ('key_press', 'key_release'): _check_key(data[0], where, problems)
+        elif not all(_is_number(v) for v in (data if kind != 'mouse_click' else data[:2])):
+            problems.append(f"{where}: {kind} coordinates must be numbers")
+        elif kind == 'mouse_click':
+            _check_button(data[2], where, problems)
+            if not isinstance(data[3], bool): problems.append(f"{where}: pressed must be true or false")
+    return problems
+
+def validate_columns(records, names):
+    """The same checks for a binary macro, done on whole columns."""
+    import numpy as np
+    problems = []
+    types = records['type']
+    bad = np.flatnonzero(types >= len(EVENT_TYPES))
+    problems += [f"event {i}: unknown type code {types[i]}" for i in bad[:MAX_PROBLEMS].tolist()]
+    times = np.asarray(records['time'], dtype=np.float64)
+    if not np.isfinite(times).all(): problems.append("non-finite timestamps")
+    backwards = np.flatnonzero(np.diff(times) < 0) + 1
+    problems += [f"event {i}: time goes backwards ({times[i]} < {times[i - 1]})" for i in backwards[:MAX_PROBLEMS].tolist()]
+    is_key = (types == KEY_PRESS) | (types == KEY_RELEASE)
+    is_click = types == MOUSE_CLICK
+    for field, mask in (('key', is_key), ('button', is_click)):
+        index = records[field][mask]
+        out = np.flatnonzero(mask)[(index < 0) | (index >= len(names))]
+        problems += [f"event {i}: {field} name index out of range" for i in out[:MAX_PROBLEMS].tolist()]
+    used_keys = set(records['key'][is_key].tolist()); used_buttons = set(records['button'][is_click].tolist())
+    for i, name in enumerate(names):
+        if i in used_keys: _check_key(name, f"name table {i}", problems)
+        if i in used_buttons: _check_button(name, f"name table {i}", problems)
+    return problems
+
+def validate_file(file_path):
+    if is_composition(file_path):
+        folder = os.path.dirname(file_path)
+        missing = sorted(name for name in referenced_macros(load_composition(file_path))
+                         if not os.path.exists(find_macro_file(folder, name)))
+        return {'events': None, 'problems': [f"references a missing macro '{name}'" for name in missing]}
+    if is_binary(file_path):
+        records, names = load_columns(file_path)
+        return {'events': len(records), 'problems': validate_columns(records, names)}
+    with open(file_path, "r") as f: document = json.load(f)
+    if not isinstance(document, dict) or 'actions' not in document:
+        return {'events': None, 'problems': ["not a macro: no 'actions' list"]}
+    return {'events': len(document['actions']) if isinstance(document['actions'], list) else None,
+            'problems': validate_events(document['actions'])}
+
+def _fold_edits(file_path):
+    """Applies a pending edit log first; the log would not match the rewritten file."""
+    if not edits_mtime(file_path): return False
+    from macro_edits import MacroEditor
+    return MacroEditor(file_path).compact()
+
+def normalize_file(file_path):
+    """Puts a macro's events back in time order, rewriting it only if needed. Refuses otherwise invalid macros."""
+    problems = [p for p in validate_file(file_path)['problems'] if "time goes backwards" not in p]
+    if problems: raise ValueError(f"{len(problems)} problems, first: {problems[0]}")
+    folded = _fold_edits(file_path)
+    if is_binary(file_path):
+        import numpy as np
+        records, names = load_columns(file_path)
+        order = np.argsort(records['time'], kind="stable")
+        reordered = int((order != np.arange(len(order))).sum())
+        if reordered:
+            records = records[order]  # copies, releasing the memory map before the file is replaced
+            save_columns(file_path, records, names)
+    else:
+        events = load_events(file_path)
+        order = sorted(range(len(events)), key=lambda i: events[i]['time'])
+        reordered = sum(1 for i, j in enumerate(order) if i != j)
+        if reordered: save_events(file_path, [events[i] for i in order])
+    return {'reordered': reordered, 'edits_folded': folded}
+
+def convert_file(file_path, target_ext=BINARY_EXT):
+    folded = _fold_edits(file_path)
+    return {'converted_to': os.path.basename(convert_macro(file_path, target_ext)), 'edits_folded': folded}
+
+def simplify_macro(file_path, tolerance_px=2.0, tolerance_ms=20.0):
+    from simplify import simplify_file
+    _fold_edits(file_path)
+    removed, size_before, size_after = simplify_file(file_path, tolerance_px, tolerance_ms)
+    return {'removed': removed, 'bytes_saved': size_before - size_after}
+
+def metadata_file(file_path):
+    from macro_catalog import read_metadata
+    event_count, duration = read_metadata(file_path)
+    stat = os.stat(file_path)
+    return {'event_count': event_count, 'duration': duration, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+def process_file(operation, file_path, options):
+    """Runs one operation on one file. Never raises; failures come back as status 'error'."""
+    start = time.perf_counter()
+    result = {'file': os.path.basename(file_path), 'status': 'ok'}
+    try:
+        if operation == "validate":
+            result.update(validate_file(file_path))
+            problems = result['problems']
+            if problems:
+                result['status'] = 'invalid'
+                result['problem_count'], result['problems'] = len(problems), problems[:MAX_PROBLEMS]
+        elif operation == "normalize": result.update(normalize_file(file_path))
+        elif operation == "convert": result.update(convert_file(file_path, options.get('target_ext', BINARY_EXT)))
+        elif operation == "simplify": result.update(simplify_macro(file_path, options.get('tolerance_px', 2.0), options.get('tolerance_ms', 20.0)))
+        elif operation == "reindex": result.update(metadata_file(file_path))
+        else: raise ValueError(f"Unknown operation: {operation}")
+    except Exception as e:  # a corrupt macro can fail in json, numpy or anywhere below them
+        result['status'], result['error'] = 'error', f"{type(e).__name__}: {e}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def process_chunk(operation, file_paths, options):
+    return [process_file(operation, file_path, options) for file_path in file_paths]
+
+def batch_files(folder, operation, target_ext=BINARY_EXT):
+    """The files an operation applies to, largest first."""
+    exts = MACRO_EXTS + (COMPOSITION_EXT,) if operation in ("validate", "reindex") else MACRO_EXTS
+    paths = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            ext = os.path.splitext(entry.name)[1]
+            if ext not in exts or not entry.is_file(): continue
+            if operation == "convert" and ext == target_ext: continue
+            paths.append((entry.stat().st_size, entry.path))
+    return [path for _, path in sorted(paths, reverse=True)]
+
+def _chunks(paths, workers):
+    size = max(1, min(CHUNK_FILES, len(paths) // (workers * 4)))
+    return [paths[i:i + size] for i in range(0, len(paths), size)]
+
+def _run_pool(operation, chunks, options, workers, collect):
+    """Runs chunks in a new process pool. Returns the chunks lost when the pool broke."""
+    lost = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_chunk, operation, chunk, options): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try: collect(future.result())
+            except BrokenProcessPool: lost.append(futures[future])
+    return lost
+
+def run_batch(folder, operation, options=None, workers=None, progress=None):
+    """Runs operation over every applicable file in folder. Returns the summary report dict.
+
+    progress(done, total) is called from this thread as results come in. workers=1 runs in
+    this process.
+    """
+    options = options or {}
+    paths = batch_files(folder, operation, options.get('target_ext', BINARY_EXT))
+    workers = max(1, workers or os.cpu_count() or 1)
+    start, results = time.perf_counter(), []
+    def collect(chunk_results):
+        results.extend(chunk_results)
+        if progress: progress(len(results), len(paths))
+    if workers == 1 or len(paths) < 2:
+        for path in paths: collect([process_file(operation, path, options)])
+    else:
+        # A worker that dies outright (e.g. killed for memory) breaks the whole pool and every
+        # unfinished chunk with it. Those files are retried one per task in fresh pools while that
+        # makes progress, then one at a time, so only the file that crashed a worker fails.
+        remaining = [path for chunk in _run_pool(operation, _chunks(paths, workers), options, workers, collect) for path in chunk]
+        while remaining:
+            left = [path for path, in _run_pool(operation, [[path] for path in remaining], options, workers, collect)]
+            if len(left) == len(remaining): break
+            remaining = left
+        for path in remaining:
+            if _run_pool(operation, [[path]], options, 1, collect):
+                collect([{'file': os.path.basename(path), 'status': 'error', 'error': "worker crashed", 'seconds': 0.0}])
+    if operation == "reindex": _store_metadata(folder, results)
+    results.sort(key=lambda result: result['file'])
+    return summarize(operation, folder, results, time.perf_counter() - start, workers)
+
+def _store_metadata(folder, results):
+    """Writes worker-computed metadata into the catalog; refresh() then only drops stale rows.
+
+    Files the workers could not read are stored with no events, as the catalog lists any
+    unreadable macro, so refresh() does not read them again in this process.
+    """
+    from macro_catalog import MacroCatalog
+    catalog = MacroCatalog(folder)
+    try:
+        for result in results:
+            if result['status'] == 'ok':
+                catalog.store(result['file'], result['mtime_ns'], result['size'], result['event_count'], result['duration'])
+                continue
+            try: stat = os.stat(os.path.join(folder, result['file']))
+            except OSError: continue  # gone; refresh() drops it
+            catalog.store(result['file'], stat.st_mtime_ns, stat.st_size, 0, 0.0)
+        catalog.refresh()
+    finally:
+        catalog.close()
+
+def summarize(operation, folder, results, elapsed, workers):
+    counts = {}
+    for result in results: counts[result['status']] = counts.get(result['status'], 0) + 1
+    return {'operation': operation, 'folder': folder, 'files': len(results), 'workers': workers,
+            'elapsed_s': elapsed, 'files_per_s': len(results) / elapsed if elapsed else 0.0,
+            'cpu_s': sum(result['seconds'] for result in results), 'counts': counts,
+            'failures': [result for result in results if result['status'] != 'ok'], 'results': results}
+
+def format_summary(summary):
+    counts = ", ".join(f"{count} {status}" for status, count in sorted(summary['counts'].items())) or "nothing to do"
+    lines = [f"{summary['operation']}: {summary['files']} files in {summary['elapsed_s']:.2f}s "
+             f"({summary['files_per_s']:.0f} files/s, {summary['workers']} workers): {counts}"]
+    for result in summary['failures']:
+        detail = result.get('error') or f"{result['problem_count']} problems, first: {result['problems'][0]}"
+        lines.append(f"  {result['file']}: {detail}")
+    return "\n".join(lines)
+
+def write_report(path, summary):
+    with open(path, "w") as f: json.dump(summary, f, indent=4)
@@ -0,0 +1,60 @@
+"""Idle cost of the input listeners: every listener running vs. the keyboard hook only.
+
+Needs a desktop session, since it hooks the real keyboard and mouse. Move the mouse and type
+during each window, the way someone uses the machine while SimpleMacro sits idle; reports
+process CPU time, context switches (wakeups), threads and listener callbacks for each mode.
+
+Run from the repository root: python benchmarks/bench_idle.py [--seconds 10]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource
+except ImportError:  # Windows: CPU time only
+    resource = None
+
+from pynput_handler import PynputHandler
+
+def _context_switches():
+    if resource is None: return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_nvcsw + usage.ru_nivcsw
+
+def _counting(handler, name, counts):
+    callback = getattr(handler, name)
+    def counted(*args):
+        counts[0] += 1
+        return callback(*args)
+    setattr(handler, name, counted)
+
+def measure(seconds, all_listeners):
+    handler = PynputHandler(listen=False)
+    counts = [0]
+    for name in ('on_press', 'on_release', 'on_click', 'on_move', 'on_scroll'): _counting(handler, name, counts)
+    backend = handler.backend
+    backend.start_keyboard_listener(handler.on_press, handler.on_release)
+    if all_listeners: backend.start_mouse_listener(handler.on_click, handler.on_move, handler.on_scroll)
+    threads = threading.active_count()
+    cpu, switches = time.process_time(), _context_switches()
+    time.sleep(seconds)
+    cpu, switches = time.process_time() - cpu, _context_switches() - switches
+    backend.stop_listeners()
+    return (f"{cpu * 1e3:8.1f}ms CPU ({cpu / seconds * 100:.2f}%) | {switches / seconds:8.1f} context switches/s | "
+            f"{threads} threads | {counts[0] / seconds:8.1f} callbacks/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0, help="length of each window (default: %(default)s)")
+    args = parser.parse_args()
+    for label, all_listeners in (("keyboard + mouse", True), ("keyboard only", False)):
+        print(f"{label}: use the mouse and keyboard for {args.seconds:g}s...", flush=True)
+        print(f"  {measure(args.seconds, all_listeners)}")
+
+if __name__ == "__main__":
+    main()
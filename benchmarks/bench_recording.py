@@ -0,0 +1,55 @@
+"""Micro-benchmark of per-callback recording cost, in events/sec.
+
+Run from the repository root: python benchmarks/bench_recording.py [events]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from macro_store import KEY_PRESS
+from recording_buffer import RecordingBuffer
+
+def legacy_callbacks():
+    """The dict-per-event recorder PynputHandler used before RecordingBuffer."""
+    events, start = [], time.time() - 1
+    def add_event(event_type, *args):
+        if time.time() > start:
+            events.append({'time': time.time(), 'type': event_type, 'data': args})
+    def on_move(x, y):
+        if events:
+            last_event = events[-1]
+            if last_event['type'] == 'mouse_move':
+                if abs(x - last_event['data'][0]) < 5 and abs(y - last_event['data'][1]) < 5:
+                    return
+        add_event('mouse_move', x, y)
+    return on_move, lambda key: add_event('key_press', str(key))
+
+def buffer_callbacks():
+    buffer = RecordingBuffer(time.monotonic_ns())
+    return (lambda x, y: buffer.add_move(x, y, 5)), (lambda key: buffer.add_key(KEY_PRESS, key))
+
+def run(on_move, on_key, count, threads):
+    def mouse_thread():
+        for i in range(count): on_move(i * 7 % 2000, i * 13 % 1000)
+    def keyboard_thread():
+        for i in range(count): on_key('a')
+    workers = [threading.Thread(target=mouse_thread)]
+    if threads == 2: workers.append(threading.Thread(target=keyboard_thread))
+    start = time.perf_counter()
+    for worker in workers: worker.start()
+    for worker in workers: worker.join()
+    elapsed = time.perf_counter() - start
+    return count * len(workers) / elapsed
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    for threads in (1, 2):
+        for label, factory in (("legacy dict list", legacy_callbacks), ("RecordingBuffer", buffer_callbacks)):
+            rate = run(*factory(), count, threads)
+            print(f"{label:>17} | {threads} listener(s) | {rate:>12,.0f} events/s | {1e9 / rate:>7.0f} ns/callback")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Benchmark suite that runs headless on the in-memory FakeBackend.
+
+Reports, per macro size and storage format: save/load/compile time and file size, playback
+lateness and injected events/sec, and recording throughput through the listener callbacks.
+
+Run from the repository root: python benchmarks/bench_suite.py [--sizes 1000,10000,100000,1000000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from input_backends import FakeBackend
+from macro_plan import compile_file, RESAMPLE_RATES
+from macro_store import save_events, load_events, load_columns, JSON_EXT, BINARY_EXT
+from playback import format_report
+from pynput_handler import PynputHandler
+
+def synthetic_events(count):
+    """Mostly 1ms-spaced mouse moves, with a key click, a mouse click and a scroll every 100 events."""
+    events, t, i = [], 0.0, 0
+    while len(events) < count:
+        t += 0.001; i += 1
+        if i % 100 == 0:
+            events += [{'time': t, 'type': 'key_press', 'data': ["'a'"]}, {'time': t + 0.0005, 'type': 'key_release', 'data': ["'a'"]}]
+        elif i % 100 == 50:
+            events += [{'time': t, 'type': 'mouse_click', 'data': [i % 1920, i % 1080, 'Button.left', True]},
+                       {'time': t + 0.0005, 'type': 'mouse_click', 'data': [i % 1920, i % 1080, 'Button.left', False]}]
+        elif i % 100 == 75:
+            events.append({'time': t, 'type': 'mouse_scroll', 'data': [i % 1920, i % 1080, 0, -1]})
+        else:
+            events.append({'time': t, 'type': 'mouse_move', 'data': [i % 1920, (i * 3) % 1080]})
+    return events[:count]
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def bench_storage(folder, events, ext, backend):
+    path = os.path.join(folder, f"bench{ext}")
+    _, save_s = timed(save_events, path, events)
+    if ext == BINARY_EXT: _, load_s = timed(load_columns, path)
+    else: _, load_s = timed(load_events, path)
+    plan, compile_s = timed(compile_file, path, backend)
+    size = os.path.getsize(path)
+    os.remove(path)
+    return plan, f"save {save_s * 1e3:9.1f}ms | load {load_s * 1e3:9.1f}ms | load+compile {compile_s * 1e3:9.1f}ms | {size / 1e6:8.2f} MB"
+
+def bench_playback(plan, speed):
+    backend = FakeBackend()
+    handler = PynputHandler(listen=False, backend=backend)
+    report, elapsed = timed(handler.play_plan, plan, speed)
+    return f"playback x{speed:g}: {len(backend.injected) / elapsed:>10,.0f} injected/s, {format_report(report)}"
+
+def bench_resampling(plan, rates):
+    from resample import resample_plan
+    results = []
+    for rate in rates:
+        resampled, elapsed = timed(resample_plan, plan, rate)
+        results.append(f"{rate} Hz: {len(resampled):,} steps in {elapsed * 1e3:.1f}ms")
+    return f"resampled moves ({len(plan):,} steps): " + ", ".join(results)
+
+def bench_recording(events):
+    backend = FakeBackend()
+    handler = PynputHandler(backend=backend)
+    handler.set_recording_delay(0)
+    handler.start_recording()
+    elapsed = backend.feed(events)
+    recorded = len(handler.stop_recording())
+    return f"recording: {len(events) / elapsed:>10,.0f} callbacks/s, {recorded} events kept"
+
+def bench_hotkeys(presses=10000):
+    """Listener-side cost of a hotkey press (a queue append) and its wait until dispatch."""
+    from instrumentation import Instrumentation
+    handler = PynputHandler(listen=False, backend=FakeBackend())
+    handler.stats = stats = Instrumentation()
+    ran = []
+    handler.set_hotkeys({'F9': lambda: ran.append(1)})
+    for i in range(presses):
+        handler.on_press('F9'); handler.on_press('F9')  # the second press is an auto-repeat
+        handler.on_release('F9')
+        if i % 100 == 99: handler.dispatch_hotkeys()
+    handler.dispatch_hotkeys()
+    callback, dispatch = stats.callbacks['on_hotkey'].to_dict(), stats.hotkey_dispatch.to_dict()
+    return (f"hotkeys: listener callback p50 {callback['p50_us']:.1f}us p99 {callback['p99_us']:.1f}us, "
+            f"queued to dispatch p50 {dispatch['p50_us']:.1f}us p99 {dispatch['p99_us']:.1f}us, "
+            f"{len(ran)} dispatched, {stats.dropped['on_hotkey']} auto-repeats dropped")
+
+def bench_batch(folder, events, files=64):
+    """batch validate over a folder of JSON macros, on one worker and on every CPU."""
+    from batch import run_batch
+    batch_folder = os.path.join(folder, "batch")
+    os.makedirs(batch_folder)
+    for i in range(files): save_events(os.path.join(batch_folder, f"m{i}{JSON_EXT}"), events)
+    results = []
+    for workers in sorted({1, os.cpu_count() or 1}):
+        summary = run_batch(batch_folder, "validate", workers=workers)
+        results.append(f"{workers} workers {summary['files_per_s']:,.1f} files/s")
+    return f"batch validate ({files} files): " + ", ".join(results)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated event counts (default: %(default)s)")
+    parser.add_argument("--play-max", type=int, default=100000, help="largest size to play back (default: %(default)s)")
+    parser.add_argument("--speed", type=float, default=10.0, help="playback speed (default: %(default)s)")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as folder:
+        for size in (int(s) for s in args.sizes.split(",")):
+            events = synthetic_events(size)
+            print(f"== {size:,} events ({events[-1]['time']:.1f}s recorded)")
+            for ext in (JSON_EXT, BINARY_EXT):
+                plan, storage = bench_storage(folder, events, ext, FakeBackend())
+                print(f"  {ext:5} {storage}")
+            if size <= args.play_max: print(f"  {bench_playback(plan, args.speed)}")
+            print(f"  {bench_resampling(plan, RESAMPLE_RATES)}")
+            print(f"  {bench_recording(events)}")
+        print(bench_batch(folder, synthetic_events(10000)))
+    print(bench_hotkeys())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import json
+import os
+
+from macro_store import find_macro_file
+
+# A composition is a JSON tree of nodes that reference recorded macros by name:
+#   {"macro": "login"}                       play a macro
+#   {"delay": 0.5}                           wait, in seconds
+#   {"sequence": [node, ...]}                play nodes one after another
+# Any node may carry "repeat": N. Example, A then B, 500 times, with a pause between rounds:
+#   {"repeat": 500, "sequence": [{"macro": "A"}, {"macro": "B"}, {"delay": 1}]}
+COMPOSITION_EXT = ".smc"
+
+def is_composition(file_path): return file_path.endswith(COMPOSITION_EXT)
+
+def find_playable(folder, name):
+    """Like find_macro_file(), but falls back to a composition of that name."""
+    macro_path = find_macro_file(folder, name)
+    if os.path.exists(macro_path): return macro_path
+    composition_path = os.path.join(folder, name + COMPOSITION_EXT)
+    return composition_path if os.path.exists(composition_path) else macro_path
+
+def _check(node):
+    if not isinstance(node, dict): raise ValueError(f"composition node must be an object, not {node!r}")
+    repeat = node.get("repeat", 1)
+    if not isinstance(repeat, int) or repeat < 1: raise ValueError(f"repeat must be a positive integer, not {repeat!r}")
+    kinds = [kind for kind in ("macro", "delay", "sequence") if kind in node]
+    if len(kinds) != 1: raise ValueError(f"composition node needs exactly one of macro/delay/sequence: {node!r}")
+    if kinds[0] == "macro" and not isinstance(node["macro"], str): raise ValueError(f"macro must be a name: {node!r}")
+    if kinds[0] == "delay" and (not isinstance(node["delay"], (int, float)) or node["delay"] < 0):
+        raise ValueError(f"delay must be a non-negative number of seconds: {node!r}")
+    if kinds[0] == "sequence":
+        if not isinstance(node["sequence"], list): raise ValueError(f"sequence must be a list: {node!r}")
+        for child in node["sequence"]: _check(child)
+
+def load_composition(file_path):
+    with open(file_path, "r") as f: tree = json.load(f)
+    _check(tree)
+    return tree
+
+def save_composition(file_path, tree):
+    _check(tree)
+    with open(file_path, "w") as f: json.dump(tree, f, indent=4)
+
+def referenced_macros(node, names=None):
+    names = set() if names is None else names
+    if "macro" in node: names.add(node["macro"])
+    for child in node.get("sequence", ()): referenced_macros(child, names)
+    return names
+
+def _totals(node, measure):
+    """Returns (steps, duration_ns) of a node, given measure(name) -> (steps, duration_ns) for one macro."""
+    if "macro" in node: count, duration = measure(node["macro"])
+    elif "delay" in node: count, duration = 0, int(node["delay"] * 1e9)
+    else:
+        count = duration = 0
+        for child in node["sequence"]:
+            child_count, child_duration = _totals(child, measure)
+            count += child_count; duration += child_duration
+    repeat = node.get("repeat", 1)
+    return count * repeat, duration * repeat
+
+def _expand(node, plans, clock):
+    """Yields plan steps shifted onto the composition timeline; clock[0] is the current offset in ns."""
+    for _ in range(node.get("repeat", 1)):
+        if "macro" in node:
+            plan, base = plans[node["macro"]], clock[0]
+            for offset, op, x, y, arg in plan.steps: yield base + offset, op, x, y, arg
+            clock[0] = base + plan.duration_ns
+        elif "delay" in node: clock[0] += int(node["delay"] * 1e9)
+        else:
+            for child in node["sequence"]: yield from _expand(child, plans, clock)
+
+class Composition:
+    """A composition with its macros compiled once; every read of `steps` starts a fresh lazy stream.
+
+    Steps are generated on demand from the referenced plans, so memory stays the same however
+    many repeats run. Quacks like a Plan for the players.
+    """
+    __slots__ = ('tree', 'plans', 'count', 'duration_ns')
+
+    def __init__(self, tree, plans):
+        self.tree, self.plans = tree, plans
+        self.count, self.duration_ns = _totals(tree, lambda name: (len(plans[name]), plans[name].duration_ns))
+
+    @property
+    def steps(self): return _expand(self.tree, self.plans, [0])
+
+    def __len__(self): return self.count
+
+def compile_composition(file_path, load_plan):
+    """Builds a Composition, compiling each referenced macro once through load_plan(macro_path)."""
+    tree = load_composition(file_path)
+    folder, plans = os.path.dirname(file_path), {}
+    for name in sorted(referenced_macros(tree)):
+        macro_path = find_macro_file(folder, name)
+        if not os.path.exists(macro_path): raise ValueError(f"composition references a missing macro '{name}'")
+        plans[name] = load_plan(macro_path)
+    return Composition(tree, plans)
+
+def composition_metadata(file_path, read_metadata):
+    """Returns (event count, duration in seconds) of the expanded composition without expanding it."""
+    tree = load_composition(file_path)
+    folder, metadata = os.path.dirname(file_path), {}
+    def measure(name):
+        if name not in metadata:
+            macro_path = find_macro_file(folder, name)
+            count, duration = read_metadata(macro_path) if os.path.exists(macro_path) else (0, 0.0)
+            metadata[name] = (count, int(duration * 1e9))
+        return metadata[name]
+    count, duration_ns = _totals(tree, measure)
+    return count, duration_ns / 1e9
+
+def composition_rows(tree, depth=0):
+    """Action-list rows for a composition, one per node, indented by nesting depth."""
+    indent, repeat = "    " * depth, tree.get("repeat", 1)
+    times = f"x{repeat}" if repeat != 1 else ""
+    if "macro" in tree: return [(indent + "Macro", tree["macro"], times, 0, 0)]
+    if "delay" in tree: return [(indent + "Delay", f"{tree['delay']}s", times, 0, 0)]
+    rows = [(indent + "Sequence", f"{len(tree['sequence'])} steps", times, 0, 0)]
+    for child in tree["sequence"]: rows += composition_rows(child, depth + 1)
+    return rows
@@ -0,0 +1,141 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+
+class InputBackend(ABC):
+    """What PynputHandler needs from the OS: input listeners, name resolution and injection.
+
+    resolve_key/resolve_button turn the names stored in macros into the objects the inject
+    methods accept; plans are compiled against a backend so playback does no lookups. The
+    keyboard and mouse listeners start and stop independently, so an idle app only hooks the keyboard.
+    A backend missing any of the abstract methods fails when it is created.
+    """
+    @abstractmethod
+    def start_keyboard_listener(self, on_press, on_release): ...
+    @abstractmethod
+    def stop_keyboard_listener(self): ...
+    @abstractmethod
+    def start_mouse_listener(self, on_click, on_move, on_scroll): ...
+    @abstractmethod
+    def stop_mouse_listener(self): ...
+
+    def start_listeners(self, on_press, on_release, on_click, on_move, on_scroll):
+        self.start_keyboard_listener(on_press, on_release)
+        self.start_mouse_listener(on_click, on_move, on_scroll)
+
+    def stop_listeners(self):
+        self.stop_mouse_listener()
+        self.stop_keyboard_listener()
+
+    @abstractmethod
+    def resolve_key(self, name): ...
+    @abstractmethod
+    def resolve_button(self, name): ...
+    @abstractmethod
+    def move(self, x, y): ...
+    @abstractmethod
+    def press_key(self, key): ...
+    @abstractmethod
+    def release_key(self, key): ...
+    @abstractmethod
+    def press_button(self, button): ...
+    @abstractmethod
+    def release_button(self, button): ...
+    @abstractmethod
+    def scroll(self, dx, dy): ...
+
+class PynputBackend(InputBackend):
+    def __init__(self):
+        from pynput import keyboard, mouse
+        self.keyboard, self.mouse = keyboard, mouse
+        self.keyboard_controller, self.mouse_controller = keyboard.Controller(), mouse.Controller()
+        self.mouse_listener = self.keyboard_listener = None
+
+    # pynput listeners cannot be restarted, so each start creates a new one.
+    def start_keyboard_listener(self, on_press, on_release):
+        if self.keyboard_listener: return
+        self.keyboard_listener = self.keyboard.Listener(on_press=on_press, on_release=on_release)
+        self.keyboard_listener.start()
+
+    def stop_keyboard_listener(self):
+        if self.keyboard_listener: self.keyboard_listener.stop()
+        self.keyboard_listener = None
+
+    def start_mouse_listener(self, on_click, on_move, on_scroll):
+        if self.mouse_listener: return
+        self.mouse_listener = self.mouse.Listener(on_click=on_click, on_move=on_move, on_scroll=on_scroll)
+        self.mouse_listener.start()
+        self.mouse_listener.wait()  # hooked before the first recorded event is due
+
+    def stop_mouse_listener(self):
+        if self.mouse_listener: self.mouse_listener.stop()
+        self.mouse_listener = None
+
+    def resolve_key(self, name):
+        if name.startswith('Key.'): return self.keyboard.Key[name[4:]]
+        if name.startswith('<') and name.endswith('>'): return self.keyboard.KeyCode.from_vk(int(name[1:-1]))
+        return name.strip("'")
+
+    def resolve_button(self, name):
+        return self.mouse.Button[name[7:]] if name.startswith('Button.') else self.mouse.Button[name]
+
+    def move(self, x, y): self.mouse_controller.position = (x, y)
+    def press_key(self, key): self.keyboard_controller.press(key)
+    def release_key(self, key): self.keyboard_controller.release(key)
+    def press_button(self, button): self.mouse_controller.press(button)
+    def release_button(self, button): self.mouse_controller.release(button)
+    def scroll(self, dx, dy): self.mouse_controller.scroll(dx, dy)
+
+class FakeBackend(InputBackend):
+    """In-memory backend for headless runs and benchmarks.
+
+    Injected input is appended to `injected` as (time.monotonic_ns(), action, args), and
+    feed() replays a synthetic event stream into the recording callbacks from a mouse and a
+    keyboard thread, the way the real listeners would call them; events for a listener that is
+    not running are dropped, as the OS would never deliver them.
+    """
+    def __init__(self):
+        self.injected = []
+        self.keyboard_callbacks = self.mouse_callbacks = None
+
+    def start_keyboard_listener(self, on_press, on_release): self.keyboard_callbacks = dict(on_press=on_press, on_release=on_release)
+    def stop_keyboard_listener(self): self.keyboard_callbacks = None
+    def start_mouse_listener(self, on_click, on_move, on_scroll): self.mouse_callbacks = dict(on_click=on_click, on_move=on_move, on_scroll=on_scroll)
+    def stop_mouse_listener(self): self.mouse_callbacks = None
+
+    def resolve_key(self, name): return name
+    def resolve_button(self, name): return name
+
+    def move(self, x, y): self.injected.append((time.monotonic_ns(), 'move', (x, y)))
+    def press_key(self, key): self.injected.append((time.monotonic_ns(), 'press_key', key))
+    def release_key(self, key): self.injected.append((time.monotonic_ns(), 'release_key', key))
+    def press_button(self, button): self.injected.append((time.monotonic_ns(), 'press_button', button))
+    def release_button(self, button): self.injected.append((time.monotonic_ns(), 'release_button', button))
+    def scroll(self, dx, dy): self.injected.append((time.monotonic_ns(), 'scroll', (dx, dy)))
+
+    def feed(self, events, realtime=False):
+        """Calls the listener callbacks for each event dict; returns the elapsed seconds.
+
+        With realtime=True each event is delivered at its recorded offset, otherwise as fast as possible.
+        """
+        callbacks = dict(self.keyboard_callbacks or {}, **(self.mouse_callbacks or {}))
+        mouse_events = [e for e in events if e['type'].startswith('mouse')] if self.mouse_callbacks else []
+        key_events = [e for e in events if e['type'].startswith('key')] if self.keyboard_callbacks else []
+        start_time = events[0]['time'] if events else 0
+        base_ns = time.monotonic_ns()
+        def deliver(stream):
+            for event in stream:
+                if realtime:
+                    delay = base_ns + (event['time'] - start_time) * 1e9 - time.monotonic_ns()
+                    if delay > 0: time.sleep(delay / 1e9)
+                event_type, data = event['type'], event['data']
+                if event_type == 'mouse_move': callbacks['on_move'](*data)
+                elif event_type == 'mouse_click': callbacks['on_click'](*data)
+                elif event_type == 'mouse_scroll': callbacks['on_scroll'](*data)
+                elif event_type == 'key_press': callbacks['on_press'](data[0])
+                elif event_type == 'key_release': callbacks['on_release'](data[0])
+        threads = [threading.Thread(target=deliver, args=(stream,)) for stream in (mouse_events, key_events) if stream]
+        start = time.perf_counter()
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        return time.perf_counter() - start
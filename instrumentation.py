@@ -0,0 +1,118 @@
+import csv
+import json
+import time
+
+from macro_plan import OP_NAMES
+
+CALLBACKS = ('on_press', 'on_release', 'on_click', 'on_move', 'on_scroll', 'on_hotkey')
+
+class Histogram:
+    """Log2-bucketed nanosecond histogram; add() is a handful of integer operations."""
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * 65  # bucket b counts values in [2**(b-1), 2**b)
+        self.count = self.total = self.max = 0
+
+    def add(self, ns):
+        if ns < 0: ns = 0
+        self.buckets[ns.bit_length()] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max: self.max = ns
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile, in ns."""
+        if not self.count: return 0
+        target, seen = self.count * q / 100, 0
+        for bucket, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target: return min(1 << bucket, self.max) if bucket else 0
+        return self.max
+
+    def to_dict(self):
+        us = lambda ns: round(ns / 1e3, 3)
+        return {'count': self.count, 'mean_us': us(self.total / self.count) if self.count else 0.0,
+                'p50_us': us(self.percentile(50)), 'p99_us': us(self.percentile(99)), 'max_us': us(self.max)}
+
+class Instrumentation:
+    """Opt-in counters for the listener callbacks, journal writes and playback.
+
+    Each histogram is only written by one thread (a listener, the journal writer, the player or
+    the UI thread for hotkey dispatch), so recording a sample needs no lock.
+    """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.callbacks = {name: Histogram() for name in CALLBACKS}
+        self.kept = dict.fromkeys(CALLBACKS, 0)
+        self.dropped = dict.fromkeys(CALLBACKS, 0)  # deduplicated moves, events outside the recording window, auto-repeated hotkeys
+        self.hotkey_dispatch = Histogram()  # hotkey press to its callback starting on the UI thread
+        self.journal_writes = Histogram()
+        self.journal_events = 0
+        self.lateness = {name: Histogram() for name in OP_NAMES}
+        self.injection = {name: Histogram() for name in OP_NAMES}
+        self._rate_mark = (self.started, 0)
+
+    def time_callback(self, name, add, *args):
+        start = time.perf_counter_ns()
+        kept = add(*args)
+        self.callbacks[name].add(time.perf_counter_ns() - start)
+        if kept: self.kept[name] += 1
+        else: self.dropped[name] += 1
+        return kept
+
+    def record_journal_write(self, ns, events):
+        self.journal_writes.add(ns)
+        self.journal_events += events
+
+    def record_hotkey_dispatch(self, ns):
+        self.hotkey_dispatch.add(ns)
+
+    def record_playback(self, op, lateness_ns, injection_ns):
+        name = OP_NAMES[op]
+        self.lateness[name].add(lateness_ns)
+        self.injection[name].add(injection_ns)
+
+    def event_rate(self):
+        """Recorded events per second since the previous call."""
+        now, total = time.monotonic(), sum(self.kept.values())
+        then, previous = self._rate_mark
+        self._rate_mark = (now, total)
+        return (total - previous) / (now - then) if now > then else 0.0
+
+    def summary(self):
+        """One line for the status bar."""
+        callback_p99 = max(h.percentile(99) for h in self.callbacks.values()) / 1e3
+        late = Histogram()
+        for h in self.lateness.values():
+            for bucket, n in enumerate(h.buckets): late.buckets[bucket] += n
+            late.count += h.count; late.max = max(late.max, h.max)
+        return (f"{self.event_rate():.0f} ev/s | callback p99 {callback_p99:.0f}us | moves dropped {self.dropped['on_move']}"
+                f" | disk p99 {self.journal_writes.percentile(99) / 1e6:.1f}ms | late p99 {late.percentile(99) / 1e6:.2f}ms")
+
+    def to_dict(self):
+        return {
+            'elapsed_s': round(time.monotonic() - self.started, 3),
+            'callbacks': {name: dict(h.to_dict(), kept=self.kept[name], dropped=self.dropped[name]) for name, h in self.callbacks.items()},
+            'journal_writes': dict(self.journal_writes.to_dict(), events=self.journal_events),
+            'hotkey_dispatch': self.hotkey_dispatch.to_dict(),
+            'playback_lateness': {name: h.to_dict() for name, h in self.lateness.items()},
+            'injection': {name: h.to_dict() for name, h in self.injection.items()},
+        }
+
+    def export(self, file_path):
+        """Writes a JSON report, or a flat CSV with one row per histogram if file_path ends in .csv."""
+        report = self.to_dict()
+        if not file_path.lower().endswith(".csv"):
+            with open(file_path, "w") as f: json.dump(report, f, indent=4)
+            return
+        rows = [('callbacks', name, stats) for name, stats in report['callbacks'].items()]
+        rows.append(('journal_writes', 'write', report['journal_writes']))
+        rows.append(('hotkey_dispatch', 'queued', report['hotkey_dispatch']))
+        rows += [(section, name, stats) for section in ('playback_lateness', 'injection') for name, stats in report[section].items()]
+        with open(file_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(['section', 'name', 'count', 'mean_us', 'p50_us', 'p99_us', 'max_us', 'kept', 'dropped', 'events'])
+            for section, name, stats in rows:
+                writer.writerow([section, name, stats['count'], stats['mean_us'], stats['p50_us'], stats['p99_us'],
+                                 stats['max_us'], stats.get('kept', ''), stats.get('dropped', ''), stats.get('events', '')])
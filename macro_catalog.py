@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+
+from macro_store import load_columns, load_events, is_binary, edits_mtime, MACRO_EXTS
+from composition import composition_metadata, is_composition, COMPOSITION_EXT
+
+CATALOG_FILE = "catalog.sqlite3"
+LISTED_EXTS = MACRO_EXTS + (COMPOSITION_EXT,)  # in order of precedence when names clash
+SORT_ORDERS = {
+    "Name": "name COLLATE NOCASE",
+    "Duration": "duration DESC, name COLLATE NOCASE",
+    "Size": "size DESC, name COLLATE NOCASE",
+    "Events": "event_count DESC, name COLLATE NOCASE",
+}
+
+def read_metadata(file_path):
+    """Returns (event count, duration in seconds) for a macro file or composition."""
+    if is_composition(file_path): return composition_metadata(file_path, read_metadata)
+    if edits_mtime(file_path):
+        from macro_edits import load_edited_columns
+        records, _ = load_edited_columns(file_path)
+        if len(records) == 0: return 0, 0.0
+        return len(records), float(records['time'][-1] - records['time'][0])
+    if is_binary(file_path):
+        records, _ = load_columns(file_path)  # only the header and two timestamps are touched
+        if len(records) == 0: return 0, 0.0
+        return len(records), float(records['time'][-1] - records['time'][0])
+    events = load_events(file_path)
+    if not events: return 0, 0.0
+    return len(events), events[-1]['time'] - events[0]['time']
+
+class MacroCatalog:
+    """Persistent index of the macro folder with per-macro metadata, kept current by mtime.
+
+    Lookups, filtering and sorting run against the index, so listing thousands of macros never
+    opens a macro file; refresh() only re-reads files whose mtime or size changed.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(folder, CATALOG_FILE), check_same_thread=False)
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS macros (
+                name TEXT PRIMARY KEY, file TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL,
+                event_count INTEGER NOT NULL, duration REAL NOT NULL)""")
+
+    def close(self):
+        with self._lock: self._db.close()
+
+    def _upsert(self, name, file_name, stat):
+        try:
+            event_count, duration = read_metadata(os.path.join(self.folder, file_name))
+        except (OSError, ValueError, KeyError, IndexError, TypeError):
+            event_count, duration = 0, 0.0  # unreadable macros stay listed so they can be fixed or deleted
+        self.store(file_name, stat.st_mtime_ns, stat.st_size, event_count, duration)
+
+    def store(self, file_name, mtime_ns, size, event_count, duration):
+        """Indexes metadata read elsewhere, e.g. by the batch workers."""
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO macros VALUES (?, ?, ?, ?, ?, ?)",
+                             (os.path.splitext(file_name)[0], file_name, mtime_ns, size, event_count, duration))
+
+    def refresh(self):
+        """Reconciles the index with the folder. Returns True if anything changed."""
+        files = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                name, ext = os.path.splitext(entry.name)
+                if ext not in LISTED_EXTS or not entry.is_file(): continue
+                # Prefer the format find_macro_file() would pick when both exist.
+                if name not in files or LISTED_EXTS.index(ext) < LISTED_EXTS.index(os.path.splitext(files[name].name)[1]):
+                    files[name] = entry
+        with self._lock:
+            indexed = {name: (file_name, mtime, size) for name, file_name, mtime, size in
+                       self._db.execute("SELECT name, file, mtime_ns, size FROM macros")}
+        changed = False
+        for name, entry in files.items():
+            stat = entry.stat()
+            if indexed.get(name) != (entry.name, stat.st_mtime_ns, stat.st_size):
+                self._upsert(name, entry.name, stat); changed = True
+        stale = [(name,) for name in indexed if name not in files]
+        if stale:
+            with self._lock, self._db: self._db.executemany("DELETE FROM macros WHERE name = ?", stale)
+            changed = True
+        return changed
+
+    def update(self, file_path):
+        """Re-indexes one macro after it was created or saved."""
+        file_name = os.path.basename(file_path)
+        self._upsert(os.path.splitext(file_name)[0], file_name, os.stat(file_path))
+
+    def rename(self, old_name, new_path):
+        file_name = os.path.basename(new_path)
+        with self._lock, self._db:
+            self._db.execute("UPDATE macros SET name = ?, file = ? WHERE name = ?",
+                             (os.path.splitext(file_name)[0], file_name, old_name))
+
+    def remove(self, name):
+        with self._lock, self._db: self._db.execute("DELETE FROM macros WHERE name = ?", (name,))
+
+    def names(self, filter_text="", sort="Name"):
+        pattern = "%" + filter_text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._lock:
+            rows = self._db.execute(f"SELECT name FROM macros WHERE name LIKE ? ESCAPE '\\' ORDER BY {SORT_ORDERS[sort]}",
+                                    (pattern,)).fetchall()
+        return [name for name, in rows]
+
+    def info(self, name):
+        with self._lock:
+            row = self._db.execute("SELECT event_count, duration, size FROM macros WHERE name = ?", (name,)).fetchone()
+        return dict(zip(("event_count", "duration", "size"), row)) if row else None
+
+    def free_name(self, prefix="macro"):
+        with self._lock:
+            taken = {name for name, in self._db.execute("SELECT name FROM macros WHERE name LIKE ?", (prefix + "%",))}
+        i = 1
+        while f"{prefix}{i}" in taken or self._file_exists(f"{prefix}{i}"): i += 1
+        return f"{prefix}{i}"
+
+    def _file_exists(self, name):
+        return any(os.path.exists(os.path.join(self.folder, name + ext)) for ext in LISTED_EXTS)
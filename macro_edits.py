@@ -0,0 +1,213 @@
+import json
+import os
+
+import numpy as np
+
+from macro_store import (load_columns, save_columns, save_event_chunks, events_to_columns, columns_to_events,
+                         is_binary, event_dtype, edits_path, EDITS_EXT)
+
+def _fingerprint(macro_path):
+    stat = os.stat(macro_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _read_log(macro_path):
+    """Returns (done, undone, intact); intact is False if anything had to be dropped."""
+    try:
+        with open(edits_path(macro_path), "r") as f: lines = f.readlines()
+    except FileNotFoundError:
+        return [], [], True
+    try:
+        if not lines or json.loads(lines[0]) != _fingerprint(macro_path): return [], [], False
+    except (json.JSONDecodeError, OSError):
+        return [], [], False
+    done, undone = [], []
+    for line in lines[1:]:
+        if not line.endswith("\n"): return done, undone, False  # torn by a crash mid-write
+        try: op = json.loads(line)
+        except json.JSONDecodeError: return done, undone, False
+        if op["op"] == "undo":
+            if done: undone.append(done.pop())
+        elif op["op"] == "redo":
+            if undone: done.append(undone.pop())
+        else:
+            done.append(op); undone.clear()
+    return done, undone, lines[0].endswith("\n")
+
+def read_edits(macro_path):
+    """Returns the effective operations of a macro's edit log, with undo/redo entries resolved.
+
+    The first line records the size and mtime of the macro the log applies to; a log whose macro
+    has since been replaced, or that cannot be parsed, is ignored. A half-written last line is dropped.
+    """
+    done, undone, _ = _read_log(macro_path)
+    return done, undone
+
+def discard_edits(macro_path):
+    try: os.remove(edits_path(macro_path))
+    except FileNotFoundError: pass
+
+class MacroEditor:
+    """Event-level editing of a saved macro through an append-only edit log.
+
+    The edited macro is an index array into the (memory-mapped) base records plus any inserted
+    events, and one delay per event from the previous one; timestamps are the running sum of
+    the delays. Indices in operations always refer to the current edited sequence, which is what
+    the grouped action rows carry as (start, end). Each operation appends one JSON line to the
+    log, so saving an edit costs bytes; compact() folds the log into the macro file.
+    """
+    def __init__(self, macro_path):
+        self.macro_path = macro_path
+        self.base, self.base_names = load_columns(macro_path)
+        self.start_time = float(self.base['time'][0]) if len(self.base) else 0.0
+        self.done, self.undone, self._intact = _read_log(macro_path)
+        self._file = None
+        self._rebuild()
+
+    def __len__(self): return len(self.order)
+
+    def _rebuild(self):
+        self.order = np.arange(len(self.base), dtype=np.int64)
+        self.delays = np.diff(np.asarray(self.base['time'], dtype=np.float64), prepend=self.start_time)
+        self.extra, self.names = np.zeros(0, dtype=event_dtype()), list(self.base_names)
+        for op in self.done: self._apply(op)
+
+    def _applied(self, op):
+        """Returns (order, delays, extra, names) with op applied, leaving the editor unchanged."""
+        order, delays, extra, names = self.order, self.delays, self.extra, self.names
+        kind = op["op"]
+        if kind == "delete":
+            index = np.concatenate([np.arange(start, end) for start, end in op["ranges"]] or [np.zeros(0, np.int64)])
+            order, delays = np.delete(order, index), np.delete(delays, index)
+        elif kind == "move":
+            start, end, to = op["start"], op["end"], op["to"]
+            block_order, block_delays = order[start:end], delays[start:end]
+            rest_order, rest_delays = np.delete(order, np.s_[start:end]), np.delete(delays, np.s_[start:end])
+            order = np.concatenate((rest_order[:to], block_order, rest_order[to:]))
+            delays = np.concatenate((rest_delays[:to], block_delays, rest_delays[to:]))
+        elif kind == "retime":
+            start, end, seconds = op["start"], op["end"], op["seconds"]
+            delays = delays.copy()
+            if end - start == 1: delays[start] = seconds  # a single event's duration is its delay
+            else:
+                inner = delays[start + 1:end]
+                total = inner.sum()
+                delays[start + 1:end] = inner * (seconds / total) if total > 0 else seconds / len(inner)
+        elif kind == "insert":
+            events = op["events"]
+            t, timed = 0.0, []
+            for event in events:
+                t += event["delay"]; timed.append({'time': t, 'type': event['type'], 'data': event['data']})
+            records, names = events_to_columns(timed, list(names))
+            first = len(self.base) + len(extra)
+            extra = np.concatenate((extra, records))
+            order = np.insert(order, op["index"], np.arange(first, first + len(records)))
+            delays = np.insert(delays, op["index"], [event["delay"] for event in events])
+        else:
+            raise ValueError(f"Unknown edit operation: {kind}")
+        return order, delays, extra, names
+
+    def _apply(self, op): self.order, self.delays, self.extra, self.names = self._applied(op)
+
+    def _log(self, entry):
+        """Appends one entry; called before the in-memory state changes."""
+        if self._file is None:
+            path = edits_path(self.macro_path)
+            if self._intact and (self.done or self.undone) and os.path.exists(path):  # read from a clean log, keep appending to it
+                self._file = open(path, "a")
+            else:
+                self._file = open(path, "w")
+                self._file.write(json.dumps(_fingerprint(self.macro_path)) + "\n")
+                for op in self.done + self.undone[::-1]: self._file.write(json.dumps(op) + "\n")
+                for _ in self.undone: self._file.write('{"op": "undo"}\n')
+                self._intact = True
+        try:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError:
+            self.close(); self._intact = False  # the entry may be half written; the next one rewrites the log
+            raise
+
+    def _do(self, op):
+        state = self._applied(op)  # an op that cannot apply raises here, before it is logged
+        self._log(op)
+        self.order, self.delays, self.extra, self.names = state
+        self.done.append(op); self.undone.clear()
+
+    def delete(self, ranges):
+        """Removes events in each [start, end) range; later events move earlier by the removed delays."""
+        self._do({"op": "delete", "ranges": [[int(s), int(e)] for s, e in sorted(ranges)]})
+
+    def move(self, start, end, to):
+        """Moves events [start, end) with their delays so they begin at index `to` of the remaining events."""
+        self._do({"op": "move", "start": int(start), "end": int(end), "to": int(to)})
+
+    def retime(self, start, end, seconds):
+        """Sets the duration of a row: the delay of a single event, or the span of a group of events."""
+        self._do({"op": "retime", "start": int(start), "end": int(end), "seconds": max(0.0, float(seconds))})
+
+    def insert(self, index, events):
+        """Inserts event dicts with 'type', 'data' and 'delay' (seconds after the previous event) before index."""
+        self._do({"op": "insert", "index": int(index),
+                  "events": [{'type': e['type'], 'data': e['data'], 'delay': float(e['delay'])} for e in events]})
+
+    def undo(self):
+        if not self.done: return False
+        self._log({"op": "undo"})
+        self.undone.append(self.done.pop())
+        self._rebuild()  # replays the remaining log over the base; compaction keeps the log short
+        return True
+
+    def redo(self):
+        if not self.undone: return False
+        state = self._applied(self.undone[-1])
+        self._log({"op": "redo"})
+        self.order, self.delays, self.extra, self.names = state
+        self.done.append(self.undone.pop())
+        return True
+
+    @property
+    def dirty(self): return bool(self.done)
+
+    def columns(self):
+        """Returns the edited (records, names)."""
+        combined = self.base if not len(self.extra) else np.concatenate((self.base, self.extra))
+        records = combined[self.order]
+        records['time'] = self.start_time + np.cumsum(self.delays)
+        return records, self.names
+
+    def close(self):
+        if self._file: self._file.close(); self._file = None
+
+    def compact(self):
+        """Rewrites the macro with the edits applied and removes the log. Returns True if anything changed."""
+        self.close()
+        if not self.done:
+            discard_edits(self.macro_path)
+            return False
+        records, names = self.columns()
+        self.base = None  # drop the memory map before the file is replaced
+        if is_binary(self.macro_path): save_columns(self.macro_path, records, names)
+        else: save_event_chunks(self.macro_path, [columns_to_events(records, names)])
+        discard_edits(self.macro_path)
+        self.base, self.base_names, self.done, self.undone = records, names, [], []
+        self.start_time = float(records['time'][0]) if len(records) else 0.0
+        self._rebuild()
+        return True
+
+def load_edited_columns(macro_path):
+    """load_columns() with any pending edit log applied."""
+    if not os.path.exists(edits_path(macro_path)): return load_columns(macro_path)
+    editor = MacroEditor(macro_path)
+    return editor.columns() if editor.dirty else (editor.base, editor.base_names)
+
+def compact_folder(folder):
+    """Folds every pending edit log in a folder into its macro. Returns the compacted macro paths."""
+    compacted = []
+    for file_name in sorted(os.listdir(folder)):
+        if not file_name.endswith(EDITS_EXT): continue
+        macro_path = os.path.join(folder, file_name[:-len(EDITS_EXT)])
+        if not os.path.exists(macro_path):
+            os.remove(os.path.join(folder, file_name)); continue
+        if MacroEditor(macro_path).compact(): compacted.append(macro_path)
+    return compacted
@@ -0,0 +1,75 @@
+import os
+import threading
+
+from composition import is_composition, load_composition, composition_rows
+from macro_store import load_columns, edits_mtime, KEY_PRESS, KEY_RELEASE, MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL
+
+def _sign(value): return (value > 0) - (value < 0)
+
+def group_columns(records, names):
+    """Groups events into action-list rows of (action, value, duration, start, end).
+
+    start/end are the event index range [start, end) the row was built from.
+    """
+    rows = []
+    n = len(records)
+    if n == 0: return rows
+    times, types, pressed, buttons, keys, xs, ys, dxs, dys = (records[f].tolist() for f in records.dtype.names)
+    key_name = lambda i: names[keys[i]].strip("'")
+    i = 0
+    while i < n:
+        code = types[i]
+        if i + 1 < n:
+            next_code = types[i + 1]
+            if code == KEY_PRESS and next_code == KEY_RELEASE and keys[i] == keys[i + 1]:
+                rows.append(("Key Click", key_name(i), f"{times[i + 1] - times[i]:.3f}s", i, i + 2))
+                i += 2; continue
+            if code == MOUSE_CLICK and pressed[i] and next_code == MOUSE_CLICK and not pressed[i + 1] and buttons[i] == buttons[i + 1]:
+                rows.append(("Mouse Click", f"({xs[i]}, {ys[i]}) {names[buttons[i]]}", f"{times[i + 1] - times[i]:.3f}s", i, i + 2))
+                i += 2; continue
+        if code == MOUSE_MOVE:
+            j = i + 1
+            while j < n and types[j] == MOUSE_MOVE: j += 1
+            rows.append(("Mouse Drag", f"From [{xs[i]}, {ys[i]}] to [{xs[j - 1]}, {ys[j - 1]}]", f"{times[j - 1] - times[i]:.2f}s", i, j))
+            i = j
+        elif code == MOUSE_SCROLL:
+            j = i + 1
+            total_dx, total_dy = dxs[i], dys[i]
+            start_dir = (_sign(total_dx), _sign(total_dy))
+            while j < n and types[j] == MOUSE_SCROLL and (_sign(dxs[j]), _sign(dys[j])) == start_dir:
+                total_dx += dxs[j]; total_dy += dys[j]; j += 1
+            rows.append(("Mouse Scroll", f"dx={total_dx}, dy={total_dy}", f"{times[j - 1] - times[i]:.2f}s", i, j))
+            i = j
+        else:
+            duration = f"{times[i] - times[i - 1]:.3f}s" if i > 0 else f"{0:.3f}s"
+            if code == KEY_PRESS: rows.append(("Key Press", key_name(i), duration, i, i + 1))
+            elif code == KEY_RELEASE: rows.append(("Key Release", key_name(i), duration, i, i + 1))
+            elif code == MOUSE_CLICK:
+                action = "Mouse Press" if pressed[i] else "Mouse Release"
+                rows.append((action, f"({xs[i]}, {ys[i]}) {names[buttons[i]]}", duration, i, i + 1))
+            i += 1
+    return rows
+
+class RowCache:
+    """Grouped action-list rows keyed by file path and mtime (and edit log mtime)."""
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def get(self, file_path):
+        mtime = (os.stat(file_path).st_mtime_ns, edits_mtime(file_path))
+        with self._lock:
+            cached = self._rows.get(file_path)
+        if cached and cached[0] == mtime: return cached[1]
+        if is_composition(file_path): rows = composition_rows(load_composition(file_path))
+        elif mtime[1]:
+            from macro_edits import load_edited_columns
+            rows = group_columns(*load_edited_columns(file_path))
+        else: rows = group_columns(*load_columns(file_path))
+        with self._lock: self._rows[file_path] = (mtime, rows)
+        return rows
+
+    def invalidate(self, file_path=None):
+        with self._lock:
+            if file_path is None: self._rows.clear()
+            else: self._rows.pop(file_path, None)
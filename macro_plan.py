@@ -0,0 +1,130 @@
+import os
+import threading
+
+from composition import is_composition, compile_composition
+from macro_store import (load_events, load_columns, is_binary, edits_mtime,
+                         KEY_PRESS, KEY_RELEASE, MOUSE_MOVE, MOUSE_CLICK)
+
+# Plan steps are (offset_ns, op, x, y, arg) tuples with everything resolved up front,
+# so the playback loop does no parsing, eval() or int() conversion. Keys and buttons are
+# resolved by the input backend the plan will be played on.
+PRESS_KEY, RELEASE_KEY, MOVE, PRESS_BUTTON, RELEASE_BUTTON, SCROLL = range(6)
+OP_NAMES = ('press_key', 'release_key', 'move', 'press_button', 'release_button', 'scroll')
+RESAMPLE_RATES = (60, 120, 240)  # fixed mouse-motion playback rates offered in Settings, in Hz
+
+class Plan:
+    __slots__ = ('steps', 'duration_ns')
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.duration_ns = steps[-1][0] if steps else 0
+
+    def __len__(self): return len(self.steps)
+
+def compile_events(events, backend):
+    steps = []
+    if not events: return Plan(steps)
+    start_time, keys, buttons = None, {}, {}
+    for event in events:
+        try:
+            if start_time is None: start_time = event['time']
+            offset = int((event['time'] - start_time) * 1e9)
+            event_type, data = event['type'], event['data']
+            if event_type in ('key_press', 'key_release'):
+                key = keys.get(data[0])
+                if key is None: key = keys[data[0]] = backend.resolve_key(data[0])
+                steps.append((offset, PRESS_KEY if event_type == 'key_press' else RELEASE_KEY, 0, 0, key))
+            elif event_type == 'mouse_move':
+                steps.append((offset, MOVE, int(data[0]), int(data[1]), None))
+            elif event_type == 'mouse_click':
+                x, y, button_str, pressed = data
+                button = buttons.get(button_str)
+                if button is None: button = buttons[button_str] = backend.resolve_button(button_str)
+                steps.append((offset, PRESS_BUTTON if pressed else RELEASE_BUTTON, int(x), int(y), button))
+            elif event_type == 'mouse_scroll':
+                x, y, dx, dy = data
+                steps.append((offset, SCROLL, int(x), int(y), (int(dx), int(dy))))
+        except (KeyError, ValueError, TypeError, IndexError) as e:
+            print(f"Skipping unplayable event {event}: {e}")
+    return Plan(steps)
+
+def compile_columns(records, names, backend):
+    """Compiles a binary macro straight from its columns, without building per-event dicts."""
+    steps = []
+    if len(records) == 0: return Plan(steps)
+    offsets = ((records['time'] - records['time'][0]) * 1e9).astype('int64').tolist()
+    keys, buttons = {}, {}
+    for i, name in enumerate(names):
+        try: keys[i] = backend.resolve_key(name)
+        except (KeyError, ValueError): pass
+        try: buttons[i] = backend.resolve_button(name)
+        except KeyError: pass
+    columns = zip(offsets, *(records[f].tolist() for f in ('type', 'pressed', 'button', 'key', 'x', 'y', 'dx', 'dy')))
+    for offset, code, pressed, button, key, x, y, dx, dy in columns:
+        if code == MOUSE_MOVE: steps.append((offset, MOVE, x, y, None))
+        elif code in (KEY_PRESS, KEY_RELEASE):
+            if key in keys: steps.append((offset, PRESS_KEY if code == KEY_PRESS else RELEASE_KEY, 0, 0, keys[key]))
+        elif code == MOUSE_CLICK:
+            if button in buttons: steps.append((offset, PRESS_BUTTON if pressed else RELEASE_BUTTON, x, y, buttons[button]))
+        else: steps.append((offset, SCROLL, x, y, (dx, dy)))
+    return Plan(steps)
+
+def compile_file(file_path, backend):
+    if edits_mtime(file_path):
+        from macro_edits import load_edited_columns
+        return compile_columns(*load_edited_columns(file_path), backend)
+    if is_binary(file_path): return compile_columns(*load_columns(file_path), backend)
+    return compile_events(load_events(file_path), backend)
+
+class PlanCache:
+    """Compiled plans keyed by file path and mtime (and edit log mtime), so playback never waits on a JSON load.
+
+    With a resample rate or idle cap set, mouse-move runs are resampled and idle gaps shortened
+    once when the plan is built. Compositions are rebuilt on each get() from the cached plans of the macros they reference.
+    """
+    def __init__(self, backend, resample_hz=0, idle_cap_s=0):
+        self.backend = backend
+        self.resample_hz = resample_hz
+        self.idle_cap_s = idle_cap_s
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def set_resample_rate(self, rate_hz):
+        if rate_hz != self.resample_hz:
+            self.resample_hz = rate_hz
+            self.invalidate()
+
+    def set_idle_cap(self, seconds):
+        if seconds != self.idle_cap_s:
+            self.idle_cap_s = seconds
+            self.invalidate()
+
+    def get(self, file_path):
+        if is_composition(file_path):
+            # Not cached itself, so it always sees the current version of each referenced macro.
+            return compile_composition(file_path, self.get)
+        mtime = (os.stat(file_path).st_mtime_ns, edits_mtime(file_path))
+        rate_hz, idle_cap_s = self.resample_hz, self.idle_cap_s
+        with self._lock:
+            cached = self._plans.get(file_path)
+        if cached and cached[0] == (mtime, rate_hz, idle_cap_s): return cached[1]
+        plan = compile_file(file_path, self.backend)
+        if rate_hz:
+            from resample import resample_plan  # NumPy is only loaded when resampling is enabled
+            plan = resample_plan(plan, rate_hz)
+        if idle_cap_s:
+            from analytics import cap_plan_idle
+            plan = cap_plan_idle(plan, idle_cap_s)
+        with self._lock: self._plans[file_path] = ((mtime, rate_hz, idle_cap_s), plan)
+        return plan
+
+    def prewarm(self, file_path):
+        def warm():
+            try: self.get(file_path)
+            except (OSError, ValueError): pass
+        threading.Thread(target=warm, daemon=True).start()
+
+    def invalidate(self, file_path=None):
+        with self._lock:
+            if file_path is None: self._plans.clear()
+            else: self._plans.pop(file_path, None)
@@ -0,0 +1,187 @@
+import os
+import json
+import shutil
+import struct
+
+JSON_EXT, BINARY_EXT = ".json", ".smb"
+MACRO_EXTS = (BINARY_EXT, JSON_EXT)
+EDITS_EXT = ".edits"  # pending event edits, see macro_edits.py
+
+EVENT_TYPES = ('key_press', 'key_release', 'mouse_move', 'mouse_click', 'mouse_scroll')
+TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+KEY_PRESS, KEY_RELEASE, MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL = range(len(EVENT_TYPES))
+
+# Binary layout: header, JSON name table (key and button names), padding to 8 bytes,
+# then one fixed-width record per event. `key` and `button` index the name table, -1 if unused.
+MAGIC, VERSION = b"SMCR", 1
+HEADER = struct.Struct("<4sHHIQ")  # magic, version, reserved, name table bytes, event count
+EVENT_FIELDS = [('time', '<f8'), ('type', 'u1'), ('pressed', 'u1'), ('button', '<i2'),
+                ('key', '<i4'), ('x', '<i4'), ('y', '<i4'), ('dx', '<i4'), ('dy', '<i4')]
+_event_dtype = None
+
+def event_dtype():
+    """NumPy is only imported once something needs the columnar representation; JSON playback never does."""
+    global _event_dtype
+    if _event_dtype is None:
+        import numpy as np
+        _event_dtype = np.dtype(EVENT_FIELDS)
+    return _event_dtype
+
+def find_macro_file(folder, name):
+    """Returns the existing file for a macro in either format, or the JSON path if there is none."""
+    for ext in MACRO_EXTS:
+        path = os.path.join(folder, f"{name}{ext}")
+        if os.path.exists(path): return path
+    return os.path.join(folder, f"{name}{JSON_EXT}")
+
+def is_binary(file_path): return file_path.endswith(BINARY_EXT)
+
+def edits_path(macro_path): return macro_path + EDITS_EXT
+
+def edits_mtime(macro_path):
+    """mtime of a macro's pending edit log, or 0 if it has none; part of the cache keys for a macro."""
+    try: return os.stat(edits_path(macro_path)).st_mtime_ns
+    except FileNotFoundError: return 0
+
+def events_to_columns(events, names=None):
+    """Returns (records, names); pass a names list to keep extending one name table across chunks."""
+    import numpy as np
+    records = np.zeros(len(events), dtype=event_dtype())
+    names = [] if names is None else names
+    name_ids = {name: i for i, name in enumerate(names)}
+    def name_id(name):
+        if name not in name_ids:
+            name_ids[name] = len(names); names.append(name)
+        return name_ids[name]
+    times, types, pressed, buttons, keys = [], [], [], [], []
+    xs, ys, dxs, dys = [], [], [], []
+    for event in events:
+        code, data = TYPE_CODES[event['type']], event['data']
+        times.append(event['time']); types.append(code)
+        x = y = dx = dy = 0; key = button = -1; is_pressed = 0
+        if code in (KEY_PRESS, KEY_RELEASE): key = name_id(data[0])
+        elif code == MOUSE_MOVE: x, y = data[0], data[1]
+        elif code == MOUSE_CLICK:
+            x, y = data[0], data[1]; button = name_id(data[2]); is_pressed = 1 if data[3] else 0
+        elif code == MOUSE_SCROLL: x, y, dx, dy = data
+        keys.append(key); buttons.append(button); pressed.append(is_pressed)
+        xs.append(int(x)); ys.append(int(y)); dxs.append(int(dx)); dys.append(int(dy))
+    for field, values in (('time', times), ('type', types), ('pressed', pressed), ('button', buttons),
+                          ('key', keys), ('x', xs), ('y', ys), ('dx', dxs), ('dy', dys)):
+        records[field] = values
+    return records, names
+
+def columns_to_events(records, names):
+    events = []
+    for t, code, pressed, button, key, x, y, dx, dy in zip(*(records[f].tolist() for f in records.dtype.names)):
+        if code in (KEY_PRESS, KEY_RELEASE): data = [names[key]]
+        elif code == MOUSE_MOVE: data = [x, y]
+        elif code == MOUSE_CLICK: data = [x, y, names[button], bool(pressed)]
+        else: data = [x, y, dx, dy]
+        events.append({'time': t, 'type': EVENT_TYPES[code], 'data': data})
+    return events
+
+def load_columns(file_path):
+    """Returns (records, names); binary macros are memory-mapped rather than read into memory."""
+    if not is_binary(file_path): return events_to_columns(load_events(file_path))
+    import numpy as np
+    with open(file_path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size: raise ValueError(f"Truncated macro file: {file_path}")
+        magic, version, _, names_len, count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION: raise ValueError(f"Not a SimpleMacro binary file: {file_path}")
+        names = json.loads(f.read(names_len).decode("utf-8"))
+    offset = _data_offset(names_len)
+    if count == 0: return np.zeros(0, dtype=event_dtype()), names
+    if os.path.getsize(file_path) < offset + count * event_dtype().itemsize:
+        raise ValueError(f"Truncated macro file: {file_path}")
+    return np.memmap(file_path, dtype=event_dtype(), mode="r", offset=offset, shape=(count,)), names
+
+def save_columns(file_path, records, names):
+    import numpy as np
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        _write_header(f, names, len(records))
+        f.write(np.ascontiguousarray(records, dtype=event_dtype()).tobytes())
+    os.replace(tmp_path, file_path)
+
+def _write_header(f, names, count):
+    names_bytes = json.dumps(names).encode("utf-8")
+    f.write(HEADER.pack(MAGIC, VERSION, 0, len(names_bytes), count))
+    f.write(names_bytes); f.write(b"\0" * (_data_offset(len(names_bytes)) - HEADER.size - len(names_bytes)))
+
+def _data_offset(names_len):
+    return (HEADER.size + names_len + 7) // 8 * 8
+
+def load_events(file_path):
+    if is_binary(file_path): return columns_to_events(*load_columns(file_path))
+    with open(file_path, "r") as f: document = json.load(f)
+    actions = document.get("actions", []) if isinstance(document, dict) else None
+    if not isinstance(actions, list): raise ValueError(f"Not a SimpleMacro macro file: {file_path}")
+    return actions
+
+def save_events(file_path, events):
+    if is_binary(file_path): return save_columns(file_path, *events_to_columns(events))
+    with open(file_path, "w") as f: json.dump({"actions": events}, f, indent=4)
+
+def save_event_chunks(file_path, chunks):
+    """Writes a macro from an iterable of event lists without holding every event in memory."""
+    tmp_path = file_path + ".tmp"
+    if not is_binary(file_path):
+        with open(tmp_path, "w") as f:
+            f.write('{"actions": [')
+            separator = "\n"
+            for chunk in chunks:
+                for event in chunk:
+                    f.write(separator + json.dumps(event)); separator = ",\n"
+            f.write("\n]}")
+        os.replace(tmp_path, file_path)
+        return
+    # The name table precedes the records, so records are spooled to a side file first.
+    records_path, names, count = file_path + ".records", [], 0
+    with open(records_path, "wb") as f:
+        for chunk in chunks:
+            records, names = events_to_columns(chunk, names)
+            f.write(records.tobytes()); count += len(records)
+    with open(tmp_path, "wb") as f:
+        _write_header(f, names, count)
+        with open(records_path, "rb") as records_file: shutil.copyfileobj(records_file, f)
+    os.remove(records_path)
+    os.replace(tmp_path, file_path)
+
+def save_recording(file_path, recording):
+    """Saves a RecordingBuffer, going straight from its columns when the target is binary."""
+    if is_binary(file_path): save_columns(file_path, *recording.to_columns())
+    else: save_events(file_path, recording.to_events())
+
+def convert_macro(file_path, target_ext=BINARY_EXT):
+    """Rewrites a macro in the other format and removes the original. Returns the new path.
+
+    Raises ValueError if a macro of that name already exists in the target format.
+    """
+    new_path = os.path.splitext(file_path)[0] + target_ext
+    if new_path == file_path: return file_path
+    if os.path.exists(new_path): raise ValueError(f"{os.path.basename(new_path)} already exists")
+    if target_ext == BINARY_EXT: save_columns(new_path, *load_columns(file_path))
+    else: save_events(new_path, load_events(file_path))
+    os.remove(file_path)
+    return new_path
+
+def convert_folder(folder, target_ext=BINARY_EXT):
+    converted, failed = [], []
+    for file_name in sorted(os.listdir(folder)):
+        root, ext = os.path.splitext(file_name)
+        if ext not in MACRO_EXTS or ext == target_ext: continue
+        try: converted.append(convert_macro(os.path.join(folder, file_name), target_ext))
+        except (OSError, ValueError, KeyError) as e: failed.append((file_name, str(e)))
+    return converted, failed
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert macros between JSON and the binary columnar format.")
+    parser.add_argument("folder", nargs="?", default="macros_json")
+    parser.add_argument("--to", choices=("binary", "json"), default="binary")
+    args = parser.parse_args()
+    converted, failed = convert_folder(args.folder, BINARY_EXT if args.to == "binary" else JSON_EXT)
+    print(f"Converted {len(converted)} macros.")
+    for file_name, error in failed: print(f"Failed {file_name}: {error}")
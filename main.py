@@ -1,13 +1,27 @@
 import tkinter as tk
-from tkinter import ttk, Menu, messagebox, Toplevel
+from tkinter import ttk, Menu, messagebox, Toplevel, filedialog, simpledialog
 import os
 import threading
 import json
-import numpy as np
 
 from pynput_handler import PynputHandler
+from playback import clamp_speed, format_report
+from macro_plan import PlanCache, RESAMPLE_RATES
+from macro_store import save_events, convert_folder, edits_mtime, edits_path, JSON_EXT, BINARY_EXT
+from macro_grouping import RowCache
+from recording_journal import JournalWriter, finalize_journal, recover_journals
+from macro_catalog import MacroCatalog, SORT_ORDERS
+from instrumentation import Instrumentation
+from scheduler import PlaybackScheduler, CANCELLED
+from composition import find_playable, is_composition
 from pynput import keyboard, mouse
 
+ROW_PAGE_SIZE = 200
+ROW_WINDOW = 3 * ROW_PAGE_SIZE  # action rows kept in the Treeview at once
+STATS_REFRESH_MS = 500
+HOTKEY_POLL_MS = 20
+MIN_IDLE_CAP_S = 0.1  # a cap of 0 would collapse every pause in the macro
+
 class MacroApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -16,10 +30,23 @@ class MacroApp(tk.Tk):
 
         self.default_macro_folder = "macros_json"
         self.create_default_macro_folder()
+        self.catalog = MacroCatalog(self.default_macro_folder)
         
         self.pynput_handler = PynputHandler()
+        self.plan_cache = PlanCache(self.pynput_handler.backend)
+        self.scheduler = PlaybackScheduler(self.pynput_handler)
+        self.row_cache = RowCache()
+        self.action_rows, self.rows_path = [], None
+        self.rows_start = self.rows_end = 0  # the window of action_rows in the Treeview
+        self.rows_shifting = False
         self.capture_listener = None
+        self.journal = None
         self.is_editing = False
+        self.editor = None  # MacroEditor of the selected macro, opened on its first edit
+        self.compacting = set()  # macro paths whose edit log is being folded into the file
+        self.is_playing = False
+        self.stats = None
+        self.stats_after = None  # the pending show_stats refresh; there is only ever one
 
         self.protocol("WM_DELETE_WINDOW", self.on_app_close)
         self.create_menu()
@@ -37,11 +64,20 @@ class MacroApp(tk.Tk):
         self.status_label = tk.Label(self.left_frame, text="Ready.", anchor="w")
         self.status_label.pack(fill=tk.X, padx=10, pady=5)
 
-        self.start_key, self.stop_key, self.play_key = None, None, None
+        self.start_key, self.stop_key, self.play_key, self.stop_play_key = None, None, None, None
         self.recording_delay = 0.1 # Default value
+        self.playback_speed = 1.0
+        self.binary_format = False
+        self.simplify_on_stop = False
+        self.simplify_px, self.simplify_ms = 2.0, 20.0
+        self.resample_hz = 0
+        self.idle_cap_s, self.cap_idle_on_play, self.cap_idle_on_stop = 2.0, False, False
         
         self.load_settings()
+        self.after(HOTKEY_POLL_MS, self.poll_hotkeys)
+        self.recover_recordings()
         self.load_macros()
+        self.refresh_catalog()
 
     def update_hotkeys(self):
         hotkeys_map = {}
@@ -51,8 +87,14 @@ class MacroApp(tk.Tk):
             if self.start_key: hotkeys_map[self.start_key] = self.start_recording
             if self.stop_key: hotkeys_map[self.stop_key] = self.stop_recording
         if self.play_key: hotkeys_map[self.play_key] = self.play_macro
+        if self.stop_play_key: hotkeys_map[self.stop_play_key] = self.stop_playback
         self.pynput_handler.set_hotkeys(hotkeys_map)
 
+    def poll_hotkeys(self):
+        """Runs hotkey callbacks on the Tk thread; the listener only queues the presses."""
+        try: self.pynput_handler.dispatch_hotkeys()
+        finally: self.after(HOTKEY_POLL_MS, self.poll_hotkeys)  # hotkeys must outlive any one failure
+
     def toggle_recording(self):
         if self.pynput_handler.is_recording:
             self.stop_recording()
@@ -60,16 +102,83 @@ class MacroApp(tk.Tk):
             self.start_recording()
         
     def on_app_close(self):
+        if self.journal:
+            self.pynput_handler.stop_recording()
+            try: self._finish_journal(self.journal)
+            except (IOError, ValueError): pass  # the journal stays on disk and is recovered on the next start
+        if self.editor: self.editor.close()  # the edit log is applied on load and compacted on a later run
+        self.scheduler.close()
         self.pynput_handler.stop_listeners()
+        self.catalog.close()
         self.destroy()
 
+    def recover_recordings(self):
+        recovered, failed = recover_journals(self.default_macro_folder)
+        for file_path in recovered: self.catalog.update(file_path)
+        if recovered: self.status_label.config(text=f"Recovered {len(recovered)} unfinished recording(s).")
+        for file_name, error in failed: messagebox.showerror("Recovery Error", f"Could not recover {file_name}: {error}")
+
     def create_menu(self):
         menubar = Menu(self); self.config(menu=menubar)
         file_menu = Menu(menubar, tearoff=False)
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="New Macro", command=self.new_macro)
+        file_menu.add_command(label="Simplify Selected Macro", command=self.simplify_selected_macro)
+        file_menu.add_command(label="Compress Idle Gaps in Selected Macro", command=self.compress_selected_macro)
+        file_menu.add_command(label="Analyze Selected Macro", command=self.analyze_selected_macro)
+        file_menu.add_command(label="Convert All Macros to Binary", command=self.convert_all_macros)
         file_menu.add_separator()
         file_menu.add_command(label="Settings", command=self.show_settings)
+        edit_menu = Menu(menubar, tearoff=False)
+        menubar.add_cascade(label="Edit", menu=edit_menu)
+        edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo_edit)
+        edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.redo_edit)
+        self.bind_all("<Control-z>", lambda e: self.undo_edit())
+        self.bind_all("<Control-y>", lambda e: self.redo_edit())
+        playback_menu = Menu(menubar, tearoff=False)
+        menubar.add_cascade(label="Playback", menu=playback_menu)
+        playback_menu.add_command(label="Pause All", command=self.pause_playback)
+        playback_menu.add_command(label="Resume All", command=self.resume_playback)
+        playback_menu.add_command(label="Stop All", command=self.stop_playback)
+        diagnostics_menu = Menu(menubar, tearoff=False)
+        menubar.add_cascade(label="Diagnostics", menu=diagnostics_menu)
+        self.instrumentation_var = tk.BooleanVar(value=False)
+        diagnostics_menu.add_checkbutton(label="Enable Instrumentation", variable=self.instrumentation_var, command=self.toggle_instrumentation)
+        diagnostics_menu.add_command(label="Reset Counters", command=self.reset_instrumentation)
+        diagnostics_menu.add_command(label="Export Report...", command=self.export_instrumentation)
+
+    def toggle_instrumentation(self):
+        self.stats = Instrumentation() if self.instrumentation_var.get() else None
+        self.pynput_handler.stats = self.stats
+        if self.journal: self.journal.stats = self.stats
+        self.status_label.config(text="Instrumentation enabled." if self.stats else "Instrumentation disabled.")
+        self.show_stats()
+
+    def reset_instrumentation(self):
+        if self.stats: self.toggle_instrumentation()
+
+    def export_instrumentation(self):
+        if not self.stats:
+            messagebox.showinfo("Diagnostics", "Enable instrumentation first.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+        if not file_path: return
+        try: self.stats.export(file_path)
+        except OSError as e: messagebox.showerror("Export Error", f"Could not write report: {e}")
+
+    def show_stats(self):
+        """Shows live counters in the status bar while recording or playing back with instrumentation on."""
+        if self.stats_after: self.after_cancel(self.stats_after)
+        self.stats_after = None
+        if not self.stats or not (self.pynput_handler.is_recording or self.is_playing): return
+        self.status_label.config(text=self.stats.summary())  # summary() restarts the event-rate window
+        self._schedule_stats()
+
+    def _schedule_stats(self):
+        if self.stats_after is None: self.stats_after = self.after(STATS_REFRESH_MS, self.show_stats)
+
+    def macro_path(self, macro_name):
+        return find_playable(self.default_macro_folder, macro_name)
 
     def create_default_macro_folder(self):
         if not os.path.exists(self.default_macro_folder):
@@ -84,14 +193,33 @@ class MacroApp(tk.Tk):
         self.stop_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
         self.play_button = tk.Button(control_frame, text="Play", command=self.play_macro)
         self.play_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
-        self.action_tree = ttk.Treeview(self.left_frame, columns=("Action", "Value", "Duration"), show="headings")
+        self.stop_play_button = tk.Button(control_frame, text="Stop Playback", state=tk.DISABLED, command=self.stop_playback)
+        self.stop_play_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=2)
+        tree_frame = ttk.Frame(self.left_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.action_tree = ttk.Treeview(tree_frame, columns=("Action", "Value", "Duration"), show="headings")
         self.action_tree.heading("Action", text="Action Name"); self.action_tree.heading("Value", text="Value/Location"); self.action_tree.heading("Duration", text="Duration")
-        self.action_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.tree_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.on_tree_scrollbar)
+        self.action_tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.tree_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.action_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.action_tree.bind("<Delete>", self.delete_treeview_item)
+        self.action_tree.bind("<Alt-Up>", lambda e: self.move_action_row(-1))
+        self.action_tree.bind("<Alt-Down>", lambda e: self.move_action_row(1))
+        self.action_tree.bind("<Button-3>", self.show_action_menu)
 
     def create_right_panel_widgets(self):
         macro_label = ttk.Label(self.right_frame, text="Macros", font=("Helvetica", 14))
         macro_label.pack(pady=(10, 5))
+        search_frame = ttk.Frame(self.right_frame)
+        search_frame.pack(fill=tk.X, padx=10)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self.load_macros())
+        ttk.Entry(search_frame, textvariable=self.filter_var).pack(side=tk.LEFT, expand=True, fill=tk.X)
+        self.sort_var = tk.StringVar(value="Name")
+        sort_box = ttk.Combobox(search_frame, textvariable=self.sort_var, values=list(SORT_ORDERS), state="readonly", width=8)
+        sort_box.pack(side=tk.LEFT, padx=(5, 0))
+        sort_box.bind("<<ComboboxSelected>>", lambda e: self.load_macros())
         self.macro_listbox = tk.Listbox(self.right_frame)
         self.macro_listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         self.macro_listbox.bind("<<ListboxSelect>>", self.on_macro_select)
@@ -112,6 +240,9 @@ class MacroApp(tk.Tk):
         context_menu.add_command(label="New Macro", command=self.new_macro)
         if selection != -1:
             context_menu.add_command(label="Rename", command=self.rename_macro)
+            context_menu.add_command(label="Simplify", command=self.simplify_selected_macro)
+            context_menu.add_command(label="Compress Idle Gaps", command=self.compress_selected_macro)
+            context_menu.add_command(label="Analyze", command=self.analyze_selected_macro)
             context_menu.add_command(label="Delete", command=self.confirm_delete)
         context_menu.tk_popup(event.x_root, event.y_root)
 
@@ -138,73 +269,122 @@ class MacroApp(tk.Tk):
         if new_name and new_name != old_name:
             self.macro_listbox.delete(self.editing_index)
             self.macro_listbox.insert(self.editing_index, new_name)
-            old_path = os.path.join(self.default_macro_folder, f"{old_name}.json")
-            new_path = os.path.join(self.default_macro_folder, f"{new_name}.json")
-            if os.path.exists(new_path):
-                messagebox.showwarning("Warning", f"A macro named '{new_name}' already exists.")
+            old_path = self.macro_path(old_name)
+            new_path = os.path.join(self.default_macro_folder, new_name + os.path.splitext(old_path)[1])
+            exists = os.path.exists(self.macro_path(new_name))
+            if exists or self._compacting(old_path):
+                if exists: messagebox.showwarning("Warning", f"A macro named '{new_name}' already exists.")
                 self.macro_listbox.delete(self.editing_index)
                 self.macro_listbox.insert(self.editing_index, old_name)
-            elif os.path.exists(old_path): os.rename(old_path, new_path)
+            elif os.path.exists(old_path):
+                self._release_edits(old_path)
+                os.rename(old_path, new_path); self.catalog.rename(old_name, new_path)
+                if os.path.exists(edits_path(old_path)): os.replace(edits_path(old_path), edits_path(new_path))
         self.editing_entry.destroy()
         self.is_editing = False
 
     def on_macro_select(self, event=None):
+        self.clear_action_tree()
         selected_indices = self.macro_listbox.curselection()
-        if not selected_indices:
-            self.action_tree.delete(*self.action_tree.get_children())
-            return
+        if not selected_indices: return
         macro_name = self.macro_listbox.get(selected_indices[0])
-        file_path = os.path.join(self.default_macro_folder, f"{macro_name}.json")
-        self.action_tree.delete(*self.action_tree.get_children())
+        file_path = self.macro_path(macro_name)
         if not os.path.exists(file_path): return
+        info = self.catalog.info(macro_name)
+        if info: self.status_label.config(text=f"{macro_name}: {info['event_count']} events, {info['duration']:.1f}s, {info['size'] / 1024:.0f} KB")
+        if self.editor and self.editor.macro_path != file_path: self._close_editor()
+        if info and self.cap_idle_on_play: threading.Thread(target=self._show_projection, args=(macro_name, file_path, info), daemon=True).start()
+        else: self.plan_cache.prewarm(file_path)
+        self.rows_path = file_path
+        threading.Thread(target=self._load_action_rows, args=(file_path,), daemon=True).start()
+
+    def _show_projection(self, macro_name, file_path, info):
+        """Adds the playback time with idle gaps capped to the status line; also warms the plan cache."""
+        try: capped = self.plan_cache.get(file_path).duration_ns / 1e9
+        except (IOError, ValueError): return
+        text = (f"{macro_name}: {info['event_count']} events, plays in {capped:.1f}s instead of {info['duration']:.1f}s "
+                f"with idle gaps capped at {self.idle_cap_s:g}s, {info['size'] / 1024:.0f} KB")
+        def show():
+            if self.rows_path == file_path: self.status_label.config(text=text)  # still the selected macro
+        self.after(0, show)
+
+    def _load_action_rows(self, file_path, first_row=0):
         try:
-            with open(file_path, "r") as f: events = json.load(f).get("actions", [])
-            if not events: return
-            i = 0
-            while i < len(events):
-                event = events[i]
-                row_values = ()
-                if i + 1 < len(events):
-                    next_event = events[i+1]
-                    if (event['type'] == 'key_press' and next_event['type'] == 'key_release' and event['data'][0] == next_event['data'][0]):
-                        duration = next_event['time'] - event['time']
-                        row_values = ("Key Click", event['data'][0].strip("'"), f"{duration:.3f}s")
-                        i += 2; self.action_tree.insert("", "end", values=row_values); continue
-                    if (event['type'] == 'mouse_click' and event['data'][3] and next_event['type'] == 'mouse_click' and not next_event['data'][3] and event['data'][2] == next_event['data'][2]):
-                        duration = next_event['time'] - event['time']
-                        x, y, button, _ = event['data']
-                        row_values = ("Mouse Click", f"({x}, {y}) {button}", f"{duration:.3f}s")
-                        i += 2; self.action_tree.insert("", "end", values=row_values); continue
-                if event['type'] == 'mouse_move':
-                    start_event = event
-                    j = i + 1
-                    while j < len(events) and events[j]['type'] == 'mouse_move': j += 1
-                    end_event = events[j - 1]
-                    row_values = ("Mouse Drag", f"From {start_event['data']} to {end_event['data']}", f"{end_event['time'] - start_event['time']:.2f}s")
-                    i = j
-                elif event['type'] == 'mouse_scroll':
-                    start_event = event
-                    j = i + 1
-                    total_dx, total_dy = start_event['data'][2], start_event['data'][3]
-                    start_dir = (np.sign(total_dx), np.sign(total_dy))
-                    while j < len(events) and events[j]['type'] == 'mouse_scroll':
-                        next_dx, next_dy = events[j]['data'][2], events[j]['data'][3]
-                        if (np.sign(next_dx), np.sign(next_dy)) == start_dir:
-                            total_dx += next_dx; total_dy += next_dy; j += 1
-                        else: break
-                    row_values = ("Mouse Scroll", f"dx={total_dx}, dy={total_dy}", f"{events[j-1]['time'] - start_event['time']:.2f}s")
-                    i = j
-                else:
-                    duration = 0
-                    if i > 0: duration = event['time'] - events[i-1]['time']
-                    if event['type'] == 'key_press': row_values = ("Key Press", event['data'][0].strip("'"), f"{duration:.3f}s")
-                    elif event['type'] == 'key_release': row_values = ("Key Release", event['data'][0].strip("'"), f"{duration:.3f}s")
-                    elif event['type'] == 'mouse_click' and event['data'][3]: row_values = ("Mouse Press", f"({event['data'][0]}, {event['data'][1]}) {event['data'][2]}", f"{duration:.3f}s")
-                    elif event['type'] == 'mouse_click' and not event['data'][3]: row_values = ("Mouse Release", f"({event['data'][0]}, {event['data'][1]}) {event['data'][2]}", f"{duration:.3f}s")
-                    i += 1
-                if row_values: self.action_tree.insert("", "end", values=row_values)
-        except (json.JSONDecodeError, IOError) as e:
-            messagebox.showerror("Error", f"Could not load macro file: {e}")
+            rows = self.row_cache.get(file_path)
+        except (ValueError, IOError, KeyError, IndexError) as e:
+            self.after(0, messagebox.showerror, "Error", f"Could not load macro file: {e}")
+            return
+        self.after(0, self._show_action_rows, file_path, rows, first_row)
+
+    def _show_action_rows(self, file_path, rows, first_row=0):
+        if file_path != self.rows_path: return  # another macro was selected meanwhile
+        self.action_rows = rows
+        self._show_rows_at(min(first_row, max(0, len(rows) - 1)))
+
+    # The Treeview only ever holds a window of ROW_WINDOW rows, item ids being indexes into
+    # action_rows; the window slides a page at a time as the view nears either end, and the
+    # scrollbar maps to the whole macro. Selected rows that slide out of the window are deselected.
+    def _insert_rows(self, position, start, end):
+        for offset, index in enumerate(range(start, end)):
+            self.action_tree.insert("", position if position == "end" else position + offset, iid=str(index), values=self.action_rows[index][:3])
+
+    def _show_rows_at(self, row):
+        """Refills the window around row and scrolls row to the top of the view."""
+        total = len(self.action_rows)
+        self.rows_start = max(0, min(row - ROW_PAGE_SIZE, total - ROW_WINDOW))
+        self.rows_end = min(total, self.rows_start + ROW_WINDOW)
+        self.action_tree.delete(*self.action_tree.get_children())
+        self._insert_rows("end", self.rows_start, self.rows_end)
+        if self.rows_end > self.rows_start: self.action_tree.yview_moveto((row - self.rows_start) / (self.rows_end - self.rows_start))
+
+    def _top_row(self):
+        return self.rows_start + round(self.action_tree.yview()[0] * (self.rows_end - self.rows_start))
+
+    def _shift_rows(self, direction):
+        """Slides the window a page down (1) or up (-1), keeping the rows on screen in place."""
+        self.rows_shifting = False
+        top, tree = self._top_row(), self.action_tree
+        if direction > 0:
+            end = min(len(self.action_rows), self.rows_end + ROW_PAGE_SIZE)
+            self._insert_rows("end", self.rows_end, end)
+            self.rows_end = end
+            drop = max(0, self.rows_end - self.rows_start - ROW_WINDOW)
+            if drop: tree.delete(*(str(index) for index in range(self.rows_start, self.rows_start + drop)))
+            self.rows_start += drop
+        else:
+            start = max(0, self.rows_start - ROW_PAGE_SIZE)
+            self._insert_rows(0, start, self.rows_start)
+            self.rows_start = start
+            drop = max(0, self.rows_end - self.rows_start - ROW_WINDOW)
+            if drop: tree.delete(*(str(index) for index in range(self.rows_end - drop, self.rows_end)))
+            self.rows_end -= drop
+        if self.rows_end > self.rows_start: tree.yview_moveto((top - self.rows_start) / (self.rows_end - self.rows_start))
+
+    def on_tree_scroll(self, first, last):
+        first, last = float(first), float(last)
+        total, shown = len(self.action_rows), self.rows_end - self.rows_start
+        if total and shown: self.tree_scrollbar.set((self.rows_start + first * shown) / total, (self.rows_start + last * shown) / total)
+        else: self.tree_scrollbar.set(first, last)
+        if self.rows_shifting: return
+        if last > 0.9 and self.rows_end < total: direction = 1
+        elif first < 0.1 and self.rows_start > 0: direction = -1
+        else: return
+        self.rows_shifting = True
+        self.after_idle(self._shift_rows, direction)
+
+    def on_tree_scrollbar(self, *args):
+        if args[0] != "moveto" or not self.action_rows: return self.action_tree.yview(*args)
+        total, shown = len(self.action_rows), self.rows_end - self.rows_start
+        first, last = self.action_tree.yview()
+        row = min(total - 1, max(0, int(float(args[1]) * total)))
+        if self.rows_start <= row and (row <= self.rows_end - (last - first) * shown or self.rows_end == total):
+            self.action_tree.yview_moveto((row - self.rows_start) / shown)
+        else: self._show_rows_at(row)  # a jump past the window
+
+    def clear_action_tree(self):
+        self.action_tree.delete(*self.action_tree.get_children())
+        self.action_rows, self.rows_path = [], None
+        self.rows_start = self.rows_end = 0
     
     def save_settings(self):
         def key_to_str(key):
@@ -215,12 +395,36 @@ class MacroApp(tk.Tk):
         
         self.recording_delay = self.delay_var.get()
         self.pynput_handler.set_recording_delay(self.recording_delay)
+        self.playback_speed = clamp_speed(self.speed_var.get())
+        self.binary_format = self.binary_var.get()
+        self.simplify_on_stop = self.simplify_var.get()
+        rate = self.resample_var.get()
+        self.resample_hz = 0 if rate == "Original" else int(rate.split()[0])
+        self.plan_cache.set_resample_rate(self.resample_hz)
+        try:
+            self.simplify_px, self.simplify_ms = float(self.simplify_px_var.get()), float(self.simplify_ms_var.get())
+        except (ValueError, tk.TclError): pass
+        try: self.idle_cap_s = max(MIN_IDLE_CAP_S, float(self.idle_cap_var.get()))
+        except (ValueError, tk.TclError): pass
+        self.idle_cap_var.set(f"{self.idle_cap_s:g}")
+        self.cap_idle_on_play, self.cap_idle_on_stop = self.cap_play_var.get(), self.cap_stop_var.get()
+        self.plan_cache.set_idle_cap(self.idle_cap_s if self.cap_idle_on_play else 0)
         
         settings = {
             "start_key": key_to_str(self.start_key), 
             "stop_key": key_to_str(self.stop_key), 
             "play_key": key_to_str(self.play_key),
-            "recording_delay": self.recording_delay
+            "stop_play_key": key_to_str(self.stop_play_key),
+            "recording_delay": self.recording_delay,
+            "playback_speed": self.playback_speed,
+            "binary_format": self.binary_format,
+            "simplify_on_stop": self.simplify_on_stop,
+            "simplify_px": self.simplify_px,
+            "simplify_ms": self.simplify_ms,
+            "resample_hz": self.resample_hz,
+            "idle_cap_s": self.idle_cap_s,
+            "cap_idle_on_play": self.cap_idle_on_play,
+            "cap_idle_on_stop": self.cap_idle_on_stop
         }
         try:
             with open("settings.json", "w") as f: json.dump(settings, f, indent=4)
@@ -236,17 +440,35 @@ class MacroApp(tk.Tk):
                 self.start_key = eval(settings.get("start_key")) if settings.get("start_key") else None
                 self.stop_key = eval(settings.get("stop_key")) if settings.get("stop_key") else None
                 self.play_key = eval(settings.get("play_key")) if settings.get("play_key") else None
+                self.stop_play_key = eval(settings.get("stop_play_key")) if settings.get("stop_play_key") else None
                 self.recording_delay = float(settings.get("recording_delay", 0.1))
+                self.playback_speed = clamp_speed(settings.get("playback_speed", 1.0))
+                self.binary_format = bool(settings.get("binary_format", False))
+                self.simplify_on_stop = bool(settings.get("simplify_on_stop", False))
+                self.simplify_px = float(settings.get("simplify_px", 2.0))
+                self.simplify_ms = float(settings.get("simplify_ms", 20.0))
+                self.resample_hz = int(settings.get("resample_hz", 0))
+                self.idle_cap_s = max(MIN_IDLE_CAP_S, float(settings.get("idle_cap_s", 2.0)))
+                self.cap_idle_on_play = bool(settings.get("cap_idle_on_play", False))
+                self.cap_idle_on_stop = bool(settings.get("cap_idle_on_stop", False))
         except (FileNotFoundError, json.JSONDecodeError, ValueError):
-            self.start_key, self.stop_key, self.play_key = None, None, None
+            self.start_key, self.stop_key, self.play_key, self.stop_play_key = None, None, None, None
             self.recording_delay = 0.1
+            self.playback_speed = 1.0
+            self.binary_format = False
+            self.simplify_on_stop = False
+            self.simplify_px, self.simplify_ms = 2.0, 20.0
+            self.resample_hz = 0
+            self.idle_cap_s, self.cap_idle_on_play, self.cap_idle_on_stop = 2.0, False, False
         finally:
+            self.plan_cache.set_resample_rate(self.resample_hz)
+            self.plan_cache.set_idle_cap(self.idle_cap_s if self.cap_idle_on_play else 0)
             self.update_hotkeys()
             self.pynput_handler.set_recording_delay(self.recording_delay)
     
     def show_settings(self):
         self.settings_window = Toplevel(self); self.settings_window.title("Settings")
-        self.settings_window.geometry("300x260"); self.settings_window.grab_set()
+        self.settings_window.geometry("300x580"); self.settings_window.grab_set()
 
         def key_to_display_str(key):
             if key is None: return "None"
@@ -255,7 +477,17 @@ class MacroApp(tk.Tk):
         self.start_key_var = tk.StringVar(value=key_to_display_str(self.start_key))
         self.stop_key_var = tk.StringVar(value=key_to_display_str(self.stop_key))
         self.play_key_var = tk.StringVar(value=key_to_display_str(self.play_key))
+        self.stop_play_key_var = tk.StringVar(value=key_to_display_str(self.stop_play_key))
         self.delay_var = tk.DoubleVar(value=self.recording_delay)
+        self.speed_var = tk.DoubleVar(value=self.playback_speed)
+        self.binary_var = tk.BooleanVar(value=self.binary_format)
+        self.simplify_var = tk.BooleanVar(value=self.simplify_on_stop)
+        self.simplify_px_var = tk.StringVar(value=str(self.simplify_px))
+        self.simplify_ms_var = tk.StringVar(value=str(self.simplify_ms))
+        self.idle_cap_var = tk.StringVar(value=str(self.idle_cap_s))
+        self.cap_play_var = tk.BooleanVar(value=self.cap_idle_on_play)
+        self.cap_stop_var = tk.BooleanVar(value=self.cap_idle_on_stop)
+        self.resample_var = tk.StringVar(value=f"{self.resample_hz} Hz" if self.resample_hz else "Original")
 
         tk.Label(self.settings_window, text="Start/Toggle Recording Key:").pack(pady=(10,0))
         start_label = tk.Label(self.settings_window, textvariable=self.start_key_var, relief="solid", bd=1, width=20); start_label.pack(pady=2)
@@ -269,9 +501,34 @@ class MacroApp(tk.Tk):
         play_label = tk.Label(self.settings_window, textvariable=self.play_key_var, relief="solid", bd=1, width=20); play_label.pack(pady=2)
         play_label.bind("<Button-1>", lambda e: self.start_key_capture("play"))
 
+        tk.Label(self.settings_window, text="Stop Playback Key:").pack()
+        stop_play_label = tk.Label(self.settings_window, textvariable=self.stop_play_key_var, relief="solid", bd=1, width=20); stop_play_label.pack(pady=2)
+        stop_play_label.bind("<Button-1>", lambda e: self.start_key_capture("stop_play"))
+
         tk.Label(self.settings_window, text="Recording Start Delay (s):").pack(pady=(10,0))
         delay_entry = tk.Entry(self.settings_window, textvariable=self.delay_var, width=10, justify='center'); delay_entry.pack()
 
+        tk.Label(self.settings_window, text="Playback Speed (0.5x - 10x):").pack(pady=(10,0))
+        speed_entry = tk.Entry(self.settings_window, textvariable=self.speed_var, width=10, justify='center'); speed_entry.pack()
+
+        tk.Label(self.settings_window, text="Mouse Motion Playback Rate:").pack(pady=(10,0))
+        ttk.Combobox(self.settings_window, textvariable=self.resample_var, state="readonly", width=10,
+                     values=["Original"] + [f"{rate} Hz" for rate in RESAMPLE_RATES]).pack()
+
+        tk.Checkbutton(self.settings_window, text="Save new macros in binary format", variable=self.binary_var).pack(pady=(10,0))
+        tk.Checkbutton(self.settings_window, text="Simplify mouse paths when recording stops", variable=self.simplify_var).pack()
+        tolerance_frame = tk.Frame(self.settings_window); tolerance_frame.pack()
+        tk.Label(tolerance_frame, text="Tolerance px:").pack(side=tk.LEFT)
+        tk.Entry(tolerance_frame, textvariable=self.simplify_px_var, width=5, justify='center').pack(side=tk.LEFT)
+        tk.Label(tolerance_frame, text="ms:").pack(side=tk.LEFT)
+        tk.Entry(tolerance_frame, textvariable=self.simplify_ms_var, width=5, justify='center').pack(side=tk.LEFT)
+
+        idle_frame = tk.Frame(self.settings_window); idle_frame.pack(pady=(10,0))
+        tk.Label(idle_frame, text="Cap idle gaps at (s):").pack(side=tk.LEFT)
+        tk.Entry(idle_frame, textvariable=self.idle_cap_var, width=5, justify='center').pack(side=tk.LEFT)
+        tk.Checkbutton(self.settings_window, text="during playback", variable=self.cap_play_var).pack()
+        tk.Checkbutton(self.settings_window, text="when recording stops", variable=self.cap_stop_var).pack()
+
         save_button = tk.Button(self.settings_window, text="Save", command=self.save_settings, font=("Helvetica", 10, "bold")); save_button.pack(pady=15, ipadx=10, ipady=2)
 
     def start_key_capture(self, key_type):
@@ -280,106 +537,367 @@ class MacroApp(tk.Tk):
         self.current_key_to_set = key_type
         capture_label = tk.Label(self.settings_window, text="Press any key...", fg="red", bg="#f0f0f0", font=("Helvetica", 12, "bold"))
         capture_label.pack(pady=5, fill="x", ipady=5)
-        def on_press(key):
+        def set_key(key):
             if self.current_key_to_set == "start": self.start_key = key
             elif self.current_key_to_set == "stop": self.stop_key = key
             elif self.current_key_to_set == "play": self.play_key = key
+            elif self.current_key_to_set == "stop_play": self.stop_play_key = key
             self.start_key_var.set(str(self.start_key).replace("Key.", "").replace("'", "")); self.stop_key_var.set(str(self.stop_key).replace("Key.", "").replace("'", "")); self.play_key_var.set(str(self.play_key).replace("Key.", "").replace("'", ""))
+            self.stop_play_key_var.set(str(self.stop_play_key).replace("Key.", "").replace("'", ""))
             capture_label.destroy()
             self.pynput_handler.resume()
             self.capture_listener = None
+        def on_press(key):
+            self.after(0, set_key, key)  # Tk is only touched from its own thread
             return False
         self.capture_listener = keyboard.Listener(on_press=on_press)
         self.capture_listener.start()
 
+    def show_action_menu(self, event):
+        row = self.action_tree.identify_row(event.y)
+        if row and row not in self.action_tree.selection(): self.action_tree.selection_set(row)
+        action_menu = Menu(self.action_tree, tearoff=False)
+        if self.action_tree.selection():
+            action_menu.add_command(label="Delete", command=self.delete_treeview_item)
+            action_menu.add_command(label="Move Up", accelerator="Alt+Up", command=lambda: self.move_action_row(-1))
+            action_menu.add_command(label="Move Down", accelerator="Alt+Down", command=lambda: self.move_action_row(1))
+            action_menu.add_command(label="Set Duration...", command=self.retime_action_row)
+        action_menu.add_command(label="Insert Key Click...", command=self.insert_key_click)
+        action_menu.tk_popup(event.x_root, event.y_root)
+
+    def _edit_editor(self):
+        """Returns the MacroEditor for the macro shown in the action list, or None if it cannot be edited now."""
+        file_path = self.rows_path
+        if not file_path or is_composition(file_path) or self.pynput_handler.is_recording: return None
+        if self._compacting(file_path): return None
+        if self.editor is None or self.editor.macro_path != file_path:
+            self._close_editor()
+            from macro_edits import MacroEditor
+            try: self.editor = MacroEditor(file_path)
+            except (IOError, ValueError, KeyError) as e:
+                messagebox.showerror("Edit Error", f"Cannot edit macro: {e}")
+                return None
+        return self.editor
+
+    def _close_editor(self, compact=True):
+        """Closes the open editor; its edit log is folded into the macro file in the background."""
+        editor, self.editor = self.editor, None
+        if editor is None: return
+        editor.close()
+        if not compact or not editor.dirty: return
+        self.compacting.add(editor.macro_path)
+        def compact():
+            try:
+                editor.compact()
+                self.catalog.update(editor.macro_path)
+            except (IOError, ValueError) as e:
+                self.after(0, messagebox.showerror, "Save Error", f"Could not apply edits to {os.path.basename(editor.macro_path)}: {e}")
+            finally:
+                self.after(0, self.compacting.discard, editor.macro_path)
+        threading.Thread(target=compact, daemon=True).start()
+
+    def _compacting(self, file_path):
+        """True, with a note in the status bar, while earlier edits are still being folded into file_path.
+
+        The compaction ends by replacing the file, so deleting, renaming or rewriting it meanwhile would be undone.
+        """
+        if file_path not in self.compacting: return False
+        self.status_label.config(text="Still saving earlier edits, try again in a moment.")
+        return True
+
+    def _release_edits(self, file_path):
+        """Closes the editor of file_path without compacting, before the file is changed some other way."""
+        if self.editor and self.editor.macro_path == file_path: self._close_editor(compact=False)
+
+    def _selected_rows(self):
+        return sorted(self.action_rows[int(item)] for item in self.action_tree.selection())
+
+    def _apply_edit(self, edit, status):
+        editor = self._edit_editor()
+        if editor is None: return
+        try: edit(editor)
+        except (IOError, ValueError, IndexError) as e:
+            messagebox.showerror("Edit Error", f"Edit failed: {e}")
+            return
+        self.status_label.config(text=status)
+        self._reload_action_rows()
+
+    def _reload_action_rows(self):
+        file_path = self.rows_path
+        self.plan_cache.invalidate(file_path); self.row_cache.invalidate(file_path)
+        first_row = self._top_row()
+        def reload():
+            self._load_action_rows(file_path, first_row)
+            try: self.catalog.update(file_path)
+            except (IOError, ValueError): pass
+        self.clear_action_tree()
+        self.rows_path = file_path  # still the shown macro; _show_action_rows drops rows for any other
+        threading.Thread(target=reload, daemon=True).start()
+
     def delete_treeview_item(self, event=None):
-        for item in self.action_tree.selection(): self.action_tree.delete(item)
+        rows = self._selected_rows()
+        if not rows: return
+        self._apply_edit(lambda editor: editor.delete([(row[3], row[4]) for row in rows]), f"Deleted {len(rows)} action(s).")
+
+    def move_action_row(self, direction):
+        selection = self.action_tree.selection()
+        if len(selection) != 1: return "break"
+        neighbour = int(selection[0]) + direction
+        if not 0 <= neighbour < len(self.action_rows): return "break"
+        _, _, _, start, end = self.action_rows[int(selection[0])]
+        if direction < 0: to = self.action_rows[neighbour][3]
+        else: to = start + (self.action_rows[neighbour][4] - end)  # after the next row, once this one is taken out
+        self._apply_edit(lambda editor: editor.move(start, end, to), "Moved action.")
+        return "break"
+
+    def retime_action_row(self):
+        rows = self._selected_rows()
+        if len(rows) != 1: return
+        _, _, duration, start, end = rows[0]
+        seconds = simpledialog.askfloat("Set Duration", "Duration in seconds:", parent=self, minvalue=0.0,
+                                        initialvalue=float(duration.rstrip("s")))
+        if seconds is None: return
+        self._apply_edit(lambda editor: editor.retime(start, end, seconds), f"Set duration to {seconds:.3f}s.")
+
+    def insert_key_click(self):
+        if not self.rows_path: return
+        text = simpledialog.askstring("Insert Key Click", "Key (a character, or a name like enter or Key.f5):", parent=self)
+        if not text: return
+        key = f"'{text}'" if len(text) == 1 else (text if text.startswith("Key.") else f"Key.{text}")
+        rows = self._selected_rows()
+        index = rows[0][3] if rows else (self.action_rows[-1][4] if self.action_rows else 0)
+        events = [{'type': 'key_press', 'data': [key], 'delay': 0.05}, {'type': 'key_release', 'data': [key], 'delay': 0.05}]
+        self._apply_edit(lambda editor: editor.insert(index, events), f"Inserted key click {text}.")
+
+    def undo_edit(self):
+        if self.editor and self.editor.macro_path == self.rows_path:
+            self._apply_edit(lambda editor: editor.undo(), "Undone.")
+
+    def redo_edit(self):
+        if self.editor and self.editor.macro_path == self.rows_path:
+            self._apply_edit(lambda editor: editor.redo(), "Redone.")
     
     def load_macros(self):
         self.macro_listbox.delete(0, tk.END)
-        for file_name in sorted(os.listdir(self.default_macro_folder)):
-            if file_name.endswith('.json'): self.macro_listbox.insert(tk.END, os.path.splitext(file_name)[0])
+        names = self.catalog.names(self.filter_var.get().strip(), self.sort_var.get())
+        if names: self.macro_listbox.insert(tk.END, *names)
+
+    def refresh_catalog(self):
+        """Picks up macros added, changed or removed outside the app without blocking the window."""
+        def refresh():
+            if self.catalog.refresh(): self.after(0, self.load_macros)
+        threading.Thread(target=refresh, daemon=True).start()
 
     def new_macro(self):
-        i = 1
-        while True:
-            new_name = f"macro{i}"
-            if new_name not in self.macro_listbox.get(0, tk.END): break
-            i += 1
-        file_path = os.path.join(self.default_macro_folder, f"{new_name}.json")
+        self.filter_var.set("")
+        new_name = self.catalog.free_name()
+        file_path = os.path.join(self.default_macro_folder, new_name + (BINARY_EXT if self.binary_format else JSON_EXT))
         try:
-            with open(file_path, "w") as f: json.dump({"actions": []}, f)
+            save_events(file_path, [])
+            self.catalog.update(file_path)
             self.macro_listbox.insert(tk.END, new_name)
             self.macro_listbox.selection_clear(0, tk.END)
             self.macro_listbox.selection_set(tk.END)
             self.on_macro_select(None)
         except IOError as e: messagebox.showerror("Error", f"Could not create new macro file: {e}")
 
+    def convert_all_macros(self):
+        if self.compacting:
+            self.status_label.config(text="Still saving earlier edits, try again in a moment.")
+            return
+        self.status_label.config(text="Converting macros...")
+        self._close_editor(compact=False)
+        def convert():
+            from macro_edits import compact_folder
+            compact_folder(self.default_macro_folder)  # logs refer to the old files
+            converted, failed = convert_folder(self.default_macro_folder, BINARY_EXT)
+            self.plan_cache.invalidate(); self.row_cache.invalidate()
+            self.catalog.refresh()
+            self.after(0, self.load_macros)
+            self.after(0, lambda: self.status_label.config(text=f"Converted {len(converted)} macros, {len(failed)} failed."))
+        threading.Thread(target=convert, daemon=True).start()
+
+    def simplify_selected_macro(self):
+        selected_indices = self.macro_listbox.curselection()
+        if not selected_indices: return
+        file_path = self.macro_path(self.macro_listbox.get(selected_indices[0]))
+        if not os.path.exists(file_path) or is_composition(file_path) or self._compacting(file_path): return
+        self._release_edits(file_path)
+        self.status_label.config(text="Simplifying...")
+        def simplify():
+            if self._simplify(file_path): self.after(0, self.on_macro_select, None)
+        threading.Thread(target=simplify, daemon=True).start()
+
+    def compress_selected_macro(self):
+        selected_indices = self.macro_listbox.curselection()
+        if not selected_indices: return
+        file_path = self.macro_path(self.macro_listbox.get(selected_indices[0]))
+        if not os.path.exists(file_path) or is_composition(file_path) or self._compacting(file_path): return
+        self._release_edits(file_path)
+        self.status_label.config(text="Compressing idle gaps...")
+        def compress():
+            if self._compress(file_path): self.after(0, self.on_macro_select, None)
+        threading.Thread(target=compress, daemon=True).start()
+
+    def _compress(self, file_path):
+        from analytics import cap_idle_file
+        try:
+            if edits_mtime(file_path):
+                from macro_edits import MacroEditor
+                MacroEditor(file_path).compact()
+            saved = cap_idle_file(file_path, self.idle_cap_s)
+        except (IOError, ValueError, KeyError) as e:
+            self.after(0, messagebox.showerror, "Compress Error", f"Could not compress macro: {e}")
+            return False
+        self.plan_cache.invalidate(file_path); self.row_cache.invalidate(file_path)
+        self.catalog.update(file_path)
+        self.after(0, lambda: self.status_label.config(text=f"Idle gaps capped at {self.idle_cap_s:g}s: playback is {saved:.1f}s shorter."))
+        return True
+
+    def analyze_selected_macro(self):
+        selected_indices = self.macro_listbox.curselection()
+        if not selected_indices: return
+        macro_name = self.macro_listbox.get(selected_indices[0])
+        file_path = self.macro_path(macro_name)
+        if not os.path.exists(file_path) or is_composition(file_path): return
+        self.status_label.config(text="Analyzing...")
+        def analyze():
+            from analytics import analyze, load_for_analysis, format_analysis
+            try: summary = analyze(*load_for_analysis(file_path), cap_s=self.idle_cap_s)
+            except (IOError, ValueError, KeyError, IndexError) as e:
+                self.after(0, messagebox.showerror, "Analyze Error", f"Could not analyze macro: {e}")
+                return
+            self.after(0, self._show_analysis, macro_name, format_analysis(summary))
+        threading.Thread(target=analyze, daemon=True).start()
+
+    def _show_analysis(self, macro_name, text):
+        self.status_label.config(text="Ready.")
+        window = Toplevel(self); window.title(f"Analysis: {macro_name}")
+        view = tk.Text(window, width=80, height=24, wrap="none")
+        view.insert("1.0", text); view.config(state=tk.DISABLED)
+        view.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+    def _simplify(self, file_path):
+        from simplify import simplify_file
+        try:
+            if edits_mtime(file_path):
+                from macro_edits import MacroEditor
+                MacroEditor(file_path).compact()
+            removed, size_before, size_after = simplify_file(file_path, self.simplify_px, self.simplify_ms)
+        except (IOError, ValueError, KeyError) as e:
+            self.after(0, messagebox.showerror, "Simplify Error", f"Could not simplify macro: {e}")
+            return False
+        self.plan_cache.invalidate(file_path); self.row_cache.invalidate(file_path)
+        self.catalog.update(file_path)
+        saved = size_before - size_after
+        percent = saved / size_before * 100 if size_before else 0
+        self.after(0, lambda: self.status_label.config(text=f"Simplified: removed {removed} moves, {saved} bytes smaller ({percent:.0f}%)."))
+        return True
+
     def confirm_delete(self):
         selected_indices = self.macro_listbox.curselection()
         if not selected_indices: return
         macro_name = self.macro_listbox.get(selected_indices[0])
+        if self._compacting(self.macro_path(macro_name)): return
         if messagebox.askyesno("Confirm Delete", f"Delete macro '{macro_name}'?"):
-            file_path = os.path.join(self.default_macro_folder, f"{macro_name}.json")
-            if os.path.exists(file_path):
+            file_path = self.macro_path(macro_name)
+            if os.path.exists(file_path) and not self._compacting(file_path):
                 try:
-                    os.remove(file_path); self.macro_listbox.delete(selected_indices[0]); self.action_tree.delete(*self.action_tree.get_children())
+                    self._release_edits(file_path)
+                    if os.path.exists(edits_path(file_path)): os.remove(edits_path(file_path))
+                    os.remove(file_path); self.catalog.remove(macro_name); self.plan_cache.invalidate(file_path); self.row_cache.invalidate(file_path); self.macro_listbox.delete(selected_indices[0]); self.clear_action_tree()
                 except OSError as e: messagebox.showerror("Error", f"Error deleting file: {e}")
 
     def start_recording(self):
+        if self.journal or self.pynput_handler.is_recording: return  # a second start would truncate the live journal
         if not self.macro_listbox.curselection():
             messagebox.showinfo("Recording Error", "Please select a macro to record into.")
             return
-        self.action_tree.delete(*self.action_tree.get_children())
+        file_path = self.macro_path(self.macro_listbox.get(self.macro_listbox.curselection()[0]))
+        if is_composition(file_path):
+            messagebox.showinfo("Recording Error", "Compositions are edited as files; select a recorded macro to record into.")
+            return
+        if self._compacting(file_path): return
+        self._release_edits(file_path)
+        if os.path.exists(edits_path(file_path)): os.remove(edits_path(file_path))  # the recording replaces the macro
+        self.clear_action_tree()
         self.pynput_handler.start_recording()
+        try:
+            self.journal = JournalWriter(self.pynput_handler.recording, file_path, stats=self.stats).start()
+        except IOError as e:
+            self.pynput_handler.stop_recording()
+            messagebox.showerror("Recording Error", f"Could not open recording journal: {e}")
+            return
         self.record_button.config(state=tk.DISABLED); self.stop_button.config(state=tk.NORMAL); self.play_button.config(state=tk.DISABLED)
         self.status_label.config(text="Recording...")
+        self._schedule_stats()
 
     def stop_recording(self):
-        recorded_events = self.pynput_handler.stop_recording()
+        self.pynput_handler.stop_recording()
         self.record_button.config(state=tk.NORMAL); self.stop_button.config(state=tk.DISABLED); self.play_button.config(state=tk.NORMAL)
         self.status_label.config(text="Recording stopped.")
-        selected_index = self.macro_listbox.curselection()
-        if selected_index:
-            macro_name = self.macro_listbox.get(selected_index[0])
-            file_path = os.path.join(self.default_macro_folder, f"{macro_name}.json")
-            save_thread = threading.Thread(target=self._save_events_to_file, args=(file_path, recorded_events.copy()), daemon=True)
+        journal, self.journal = self.journal, None
+        if journal:
+            save_thread = threading.Thread(target=self._save_events_to_file, args=(journal,), daemon=True)
             save_thread.start()
 
-    def _save_events_to_file(self, file_path, events):
+    def _finish_journal(self, journal):
+        journal.stop()
+        finalize_journal(journal.path, journal.macro_path)
+
+    def _save_events_to_file(self, journal):
+        file_path = journal.macro_path
         try:
-            with open(file_path, "w") as f: json.dump({"actions": events}, f, indent=4)
+            self._finish_journal(journal)
+            if self.simplify_on_stop: self._simplify(file_path)
+            if self.cap_idle_on_stop: self._compress(file_path)
+            self.catalog.update(file_path)
+            self.plan_cache.invalidate(file_path); self.row_cache.invalidate(file_path)
             self.after(0, self.on_macro_select, None)
-        except IOError as e:
+        except (IOError, ValueError) as e:
             self.after(0, messagebox.showerror, "Save Error", f"Failed to save macro: {e}")
             
     def play_macro(self):
         if not self.macro_listbox.curselection():
             messagebox.showinfo("Playback", "Please select a macro to play.")
             return
-        self.record_button.config(state=tk.DISABLED); self.play_button.config(state=tk.DISABLED)
-        self.status_label.config(text="Playing...")
-        playback_thread = threading.Thread(target=self._run_playback, daemon=True)
+        macro_name = self.macro_listbox.get(self.macro_listbox.curselection()[0])
+        self.record_button.config(state=tk.DISABLED); self.stop_play_button.config(state=tk.NORMAL)
+        self.status_label.config(text=f"Playing {macro_name}...")
+        self.is_playing = True
+        self._schedule_stats()
+        playback_thread = threading.Thread(target=self._start_playback, args=(macro_name,), daemon=True)
         playback_thread.start()
 
-    def _run_playback(self):
-        selected_indices = self.macro_listbox.curselection()
-        if not selected_indices:
-            self.after(0, self.on_playback_finished)
-            return
-        macro_name = self.macro_listbox.get(selected_indices[0])
-        file_path = os.path.join(self.default_macro_folder, f"{macro_name}.json")
+    def _start_playback(self, macro_name):
+        """Loads the plan off the Tk thread and hands it to the scheduler."""
         try:
-            with open(file_path, "r") as f: events_to_play = json.load(f).get("actions", [])
-            if events_to_play: self.pynput_handler.play_macro(events_to_play)
-        except (IOError, json.JSONDecodeError) as e:
+            plan = self.plan_cache.get(self.macro_path(macro_name))
+            self.scheduler.start(plan, macro_name, self.playback_speed,
+                                 on_finished=lambda playback, report: self.after(0, self.on_playback_finished, playback, report))
+        except Exception as e:  # whatever a malformed macro raises, the controls must come back
             self.after(0, messagebox.showerror, "Playback Error", f"Cannot load macro: {e}")
-        finally:
-            self.after(0, self.on_playback_finished)
-
-    def on_playback_finished(self):
-        self.record_button.config(state=tk.NORMAL); self.play_button.config(state=tk.NORMAL)
-        self.status_label.config(text="Playback finished.")
+            self.after(0, self.on_playback_finished, None, None)
+
+    def stop_playback(self):
+        self.scheduler.cancel_all()
+
+    def pause_playback(self):
+        self.scheduler.pause_all()
+        if self.scheduler.playbacks: self.status_label.config(text="Playback paused.")
+
+    def resume_playback(self):
+        self.scheduler.resume_all()
+        if self.scheduler.playbacks: self.status_label.config(text="Playing...")
+
+    def on_playback_finished(self, playback=None, report=None):
+        self.is_playing = bool(self.scheduler.playbacks)
+        if not self.is_playing:
+            self.record_button.config(state=tk.NORMAL); self.stop_play_button.config(state=tk.DISABLED)
+        if playback is None: return
+        status = "cancelled" if playback.state == CANCELLED else "finished"
+        if report and report['events']: self.status_label.config(text=f"Playback of {playback.name} {status} ({format_report(report)}).")
+        else: self.status_label.config(text=f"Playback of {playback.name} {status}.")
 
 if __name__ == "__main__":
     app = MacroApp()
@@ -0,0 +1,35 @@
+import time
+
+MIN_SPEED, MAX_SPEED = 0.5, 10.0
+# OS sleeps overshoot by up to a few ms, so the last stretch before a deadline is busy-waited.
+SPIN_NS = 2_000_000
+
+def clamp_speed(speed):
+    try:
+        speed = float(speed)
+    except (ValueError, TypeError):
+        return 1.0
+    return min(MAX_SPEED, max(MIN_SPEED, speed))
+
+def wait_until(deadline_ns, spin_ns=SPIN_NS):
+    """Sleeps coarsely, then spins until time.monotonic_ns() reaches deadline_ns."""
+    remaining = deadline_ns - time.monotonic_ns()
+    if remaining > spin_ns: time.sleep((remaining - spin_ns) / 1e9)
+    while time.monotonic_ns() < deadline_ns: pass
+
+def timing_report(lateness_ns):
+    """Summarises per-event lateness (ns behind the deadline) in milliseconds."""
+    if not lateness_ns: return {'events': 0, 'mean_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    ordered = sorted(lateness_ns)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return {'events': len(ordered), 'mean_ms': sum(ordered) / len(ordered) / 1e6,
+            'p99_ms': p99 / 1e6, 'max_ms': ordered[-1] / 1e6}
+
+def histogram_report(histogram):
+    """timing_report() for an instrumentation Histogram of lateness, used when playback is streamed."""
+    if not histogram.count: return timing_report([])
+    return {'events': histogram.count, 'mean_ms': histogram.total / histogram.count / 1e6,
+            'p99_ms': histogram.percentile(99) / 1e6, 'max_ms': histogram.max / 1e6}
+
+def format_report(report):
+    return f"late mean {report['mean_ms']:.2f}ms, p99 {report['p99_ms']:.2f}ms, max {report['max_ms']:.2f}ms"
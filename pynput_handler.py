@@ -1,23 +1,37 @@
 import time
-from pynput import keyboard, mouse
+from array import array
+from collections import deque
+
+from playback import clamp_speed, wait_until, timing_report, histogram_report
+from instrumentation import Histogram
+from macro_plan import compile_events, PRESS_KEY, RELEASE_KEY, MOVE, PRESS_BUTTON, RELEASE_BUTTON, SCROLL
+from macro_store import KEY_PRESS, KEY_RELEASE
+from recording_buffer import RecordingBuffer
+from input_backends import PynputBackend
+
+MOVE_THRESHOLD = 5
 
 class PynputHandler:
-    def __init__(self):
+    def __init__(self, listen=True, backend=None):
         self.is_recording = False
-        self.recorded_events = []
+        self.recording = RecordingBuffer()
+        self.recording.close()
         self.hotkeys = {}
+        # (press time ns, key) appended by the keyboard listener and drained by dispatch_hotkeys() on the UI thread.
+        # deque.append/popleft are atomic, so neither side takes a lock.
+        self.hotkey_queue = deque()
+        self.held_hotkeys = set()  # hotkeys pressed and not yet released; repeats of these are auto-repeat
         self.paused = False
         
         self.recording_delay = 0.1
         self.recording_start_time = 0
+        self.last_start_ns = 0
+        self.stats = None  # an Instrumentation while diagnostics are enabled
 
-        self.mouse_listener = mouse.Listener(
-            on_click=self.on_click, on_move=self.on_move, on_scroll=self.on_scroll)
-        self.keyboard_listener = keyboard.Listener(
-            on_press=self.on_press, on_release=self.on_release)
-        
-        self.mouse_listener.start()
-        self.keyboard_listener.start()
+        self.backend = backend or PynputBackend()
+        # Only the keyboard is hooked while idle, for the hotkeys; the mouse listener runs while recording.
+        if listen: # headless playback only needs injection
+            self.backend.start_keyboard_listener(on_press=self.on_press, on_release=self.on_release)
 
     def set_hotkeys(self, hotkeys_map):
         self.hotkeys = hotkeys_map
@@ -29,78 +43,131 @@ class PynputHandler:
         except (ValueError, TypeError):
             self.recording_delay = 0.1 
 
-    def _add_event(self, event_type, *args):
-        if self.is_recording and time.time() > self.recording_start_time:
-            event = {'time': time.time(), 'type': event_type, 'data': args}
-            self.recorded_events.append(event)
-
     def on_press(self, key):
         if self.paused: return
         if key in self.hotkeys:
-            self.hotkeys[key]()
+            if self.stats is None: self.queue_hotkey(key)
+            else: self.stats.time_callback('on_hotkey', self.queue_hotkey, key)
             return
-        self._add_event('key_press', str(key))
+        if not self.is_recording: return
+        if self.stats is None: self.recording.add_key(KEY_PRESS, key)
+        else: self.stats.time_callback('on_press', self.recording.add_key, KEY_PRESS, key)
+
+    def queue_hotkey(self, key):
+        """Queues a hotkey press unless it is an auto-repeat of a held key. Returns True if queued."""
+        if key in self.held_hotkeys: return False
+        self.held_hotkeys.add(key)
+        self.hotkey_queue.append((time.monotonic_ns(), key))
+        return True
+
+    def dispatch_hotkeys(self):
+        """Runs the callbacks of queued hotkeys; call from the UI thread. Returns how many ran.
+
+        A callback that raises is reported and skipped, so it cannot stop the hotkeys queued after it.
+        """
+        queue, ran = self.hotkey_queue, 0
+        while queue:
+            pressed_ns, key = queue.popleft()
+            callback = self.hotkeys.get(key)
+            if callback is None: continue
+            if self.stats is not None: self.stats.record_hotkey_dispatch(time.monotonic_ns() - pressed_ns)
+            try: callback()
+            except Exception as e: print(f"Error running hotkey {key}: {e}")
+            ran += 1
+        return ran
 
     def on_release(self, key):
-        self._add_event('key_release', str(key))
+        self.held_hotkeys.discard(key)
+        if not self.is_recording: return
+        if self.stats is None: self.recording.add_key(KEY_RELEASE, key)
+        else: self.stats.time_callback('on_release', self.recording.add_key, KEY_RELEASE, key)
 
     def on_click(self, x, y, button, pressed):
-        self._add_event('mouse_click', x, y, str(button), pressed)
+        if not self.is_recording: return
+        if self.stats is None: self.recording.add_click(x, y, button, pressed)
+        else: self.stats.time_callback('on_click', self.recording.add_click, x, y, button, pressed)
 
     def on_move(self, x, y):
-        if self.is_recording and time.time() > self.recording_start_time and self.recorded_events:
-            last_event = self.recorded_events[-1]
-            if last_event['type'] == 'mouse_move':
-                if abs(x - last_event['data'][0]) < 5 and abs(y - last_event['data'][1]) < 5:
-                    return
-        self._add_event('mouse_move', x, y)
+        if not self.is_recording: return
+        if self.stats is None: self.recording.add_move(x, y, MOVE_THRESHOLD)
+        else: self.stats.time_callback('on_move', self.recording.add_move, x, y, MOVE_THRESHOLD)
     
     def on_scroll(self, x, y, dx, dy):
-        self._add_event('mouse_scroll', x, y, dx, dy)
+        if not self.is_recording: return
+        if self.stats is None: self.recording.add_scroll(x, y, dx, dy)
+        else: self.stats.time_callback('on_scroll', self.recording.add_scroll, x, y, dx, dy)
     
-    def play_macro(self, events):
-        if not events: return
-        keyboard_controller, mouse_controller = keyboard.Controller(), mouse.Controller()
-        start_time = events[0]['time']
-        for event in events:
-            delay = event['time'] - start_time
-            time.sleep(max(0, delay))
-            start_time = event['time']
-            event_type, data = event['type'], event['data']
+    def inject_step(self, op, x, y, arg):
+        """Injects one plan step; play_steps inlines the same dispatch with pre-bound methods."""
+        backend = self.backend
+        if op == MOVE: backend.move(x, y)
+        elif op == PRESS_KEY: backend.press_key(arg)
+        elif op == RELEASE_KEY: backend.release_key(arg)
+        elif op == PRESS_BUTTON:
+            backend.move(x, y); backend.press_button(arg)
+        elif op == RELEASE_BUTTON:
+            backend.move(x, y); backend.release_button(arg)
+        elif op == SCROLL:
+            backend.move(x, y); backend.scroll(*arg)
+
+    def play_macro(self, events, speed=1.0):
+        return self.play_plan(compile_events(events, self.backend), speed)
+
+    def play_plan(self, plan, speed=1.0):
+        """Plays a compiled plan or a composition and returns a timing report.
+
+        Compositions are streamed, so their lateness goes into a fixed-size histogram instead of a per-event array.
+        """
+        if isinstance(plan.steps, list):
+            lateness = array('q')
+            self.play_steps(plan.steps, speed, lateness.append)
+            return timing_report(lateness)
+        lateness = Histogram()
+        self.play_steps(plan.steps, speed, lateness.add)
+        return histogram_report(lateness)
+
+    def play_steps(self, steps, speed, record_lateness):
+        """Plays plan steps against absolute deadlines from the first step; steps may be any iterable."""
+        backend = self.backend
+        move, scroll = backend.move, backend.scroll
+        press_key, release_key, press_button, release_button = backend.press_key, backend.release_key, backend.press_button, backend.release_button
+        scale = 1 / clamp_speed(speed)
+        stats = self.stats
+        base_ns = self.last_start_ns = time.monotonic_ns()
+        for offset, op, x, y, arg in steps:
+            deadline = base_ns + int(offset * scale)
+            wait_until(deadline)
+            late = time.monotonic_ns() - deadline
+            record_lateness(max(0, late))
             try:
-                if event_type == 'key_press':
-                    key = eval(f"keyboard.{data[0]}") if data[0].startswith('Key.') else data[0].strip("'")
-                    keyboard_controller.press(key)
-                elif event_type == 'key_release':
-                    key = eval(f"keyboard.{data[0]}") if data[0].startswith('Key.') else data[0].strip("'")
-                    keyboard_controller.release(key)
-                elif event_type == 'mouse_move':
-                    mouse_controller.position = (int(data[0]), int(data[1]))
-                elif event_type == 'mouse_click':
-                    x, y, button_str, pressed = data
-                    mouse_controller.position = (int(x), int(y))
-                    button = eval(f"mouse.{button_str}")
-                    if pressed: mouse_controller.press(button)
-                    else: mouse_controller.release(button)
-                elif event_type == 'mouse_scroll':
-                    x, y, dx, dy = data
-                    mouse_controller.position = (int(x), int(y))
-                    mouse_controller.scroll(int(dx), int(dy))
+                if op == MOVE: move(x, y)
+                elif op == PRESS_KEY: press_key(arg)
+                elif op == RELEASE_KEY: release_key(arg)
+                elif op == PRESS_BUTTON:
+                    move(x, y); press_button(arg)
+                elif op == RELEASE_BUTTON:
+                    move(x, y); release_button(arg)
+                elif op == SCROLL:
+                    move(x, y); scroll(*arg)
             except Exception as e:
-                print(f"Error playing back event {event}: {e}")
+                print(f"Error playing back step {(offset, op, x, y, arg)}: {e}")
+            if stats is not None: stats.record_playback(op, late, time.monotonic_ns() - deadline - late)
 
     def start_recording(self):
-        self.recorded_events = []
+        self.recording_start_time = time.monotonic_ns() + int(self.recording_delay * 1e9)
+        self.recording = RecordingBuffer(self.recording_start_time)
+        self.backend.start_mouse_listener(on_click=self.on_click, on_move=self.on_move, on_scroll=self.on_scroll)
         self.is_recording = True
-        self.recording_start_time = time.time() + self.recording_delay
 
     def stop_recording(self):
+        """Stops recording and returns the closed RecordingBuffer."""
         self.is_recording = False
-        return self.recorded_events
+        self.backend.stop_mouse_listener()
+        self.recording.close()
+        return self.recording
 
     def stop_listeners(self):
-        self.keyboard_listener.stop()
-        self.mouse_listener.stop()
+        self.backend.stop_listeners()
 
     def pause(self): self.paused = True
     def resume(self): self.paused = False
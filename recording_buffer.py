@@ -0,0 +1,131 @@
+import bisect
+import heapq
+import time
+from operator import itemgetter
+
+from macro_store import event_dtype, EVENT_TYPES, KEY_PRESS, KEY_RELEASE, MOUSE_MOVE, MOUSE_CLICK, MOUSE_SCROLL
+
+_timestamp = itemgetter(0)
+
+class RecordingBuffer:
+    """Event store written by the mouse and keyboard listener threads.
+
+    Each listener appends (time_ns, type, x, y, a, b) records to its own list, so a callback
+    costs one time.monotonic_ns() and one list.append with no lock and no string formatting.
+    Each list is written by a single thread and is therefore already in timestamp order;
+    readers merge the two by timestamp, which gives one ordering across both listeners.
+    Key and button objects are only converted to names when the recording is serialised.
+    A journal writer may drain() records while recording to keep memory bounded.
+    """
+    __slots__ = ('start_ns', 'closed', 'mouse_records', 'key_records', 'last_mouse')
+
+    def __init__(self, start_ns=0):
+        self.start_ns = start_ns
+        self.closed = False
+        self.mouse_records = []
+        self.key_records = []
+        self.last_mouse = None
+
+    def __len__(self): return len(self.mouse_records) + len(self.key_records)
+
+    def add_key(self, code, key):
+        now = time.monotonic_ns()
+        if self.closed or now < self.start_ns: return False
+        self.key_records.append((now, code, 0, 0, key, 0))
+        return True
+
+    def add_move(self, x, y, min_distance=0):
+        """Records a move unless the previous mouse event is a move within min_distance pixels."""
+        last = self.last_mouse  # only the mouse thread writes it, so no drain() can race this check
+        if last and last[1] == MOUSE_MOVE and abs(x - last[2]) < min_distance and abs(y - last[3]) < min_distance:
+            return False
+        now = time.monotonic_ns()
+        if self.closed or now < self.start_ns: return False
+        self.last_mouse = record = (now, MOUSE_MOVE, x, y, 0, 0)
+        self.mouse_records.append(record)
+        return True
+
+    def add_click(self, x, y, button, pressed):
+        now = time.monotonic_ns()
+        if self.closed or now < self.start_ns: return False
+        self.last_mouse = record = (now, MOUSE_CLICK, x, y, button, pressed)
+        self.mouse_records.append(record)
+        return True
+
+    def add_scroll(self, x, y, dx, dy):
+        now = time.monotonic_ns()
+        if self.closed or now < self.start_ns: return False
+        self.last_mouse = record = (now, MOUSE_SCROLL, x, y, dx, dy)
+        self.mouse_records.append(record)
+        return True
+
+    def close(self):
+        """Stops accepting events; callbacks still in flight on the listener threads are dropped."""
+        self.closed = True
+
+    def records(self, mouse_start=0, key_start=0):
+        """Returns the records appended after the given per-listener offsets, merged by timestamp."""
+        return _merge(self.mouse_records[mouse_start:], self.key_records[key_start:])
+
+    def drain(self, until_ns=None):
+        """Removes and returns, merged by timestamp, the records stamped at or before until_ns (all by default).
+
+        Only one thread may drain. Listeners only append, and slicing/deleting a list prefix
+        is atomic, so records appended meanwhile are left for the next drain.
+        """
+        chunks = []
+        for records in (self.mouse_records, self.key_records):
+            n = len(records) if until_ns is None else bisect.bisect_right(records, until_ns, key=_timestamp)
+            chunks.append(records[:n])
+            del records[:n]
+        return _merge(*chunks)
+
+    def to_events(self, records=None):
+        """Returns records as the dicts stored in JSON macros, timed in seconds from start_ns."""
+        if records is None: records = self.records()
+        events, names = [], {}
+        for t, code, x, y, a, b in records:
+            t = (t - self.start_ns) / 1e9
+            if code == MOUSE_MOVE: data = [int(x), int(y)]
+            elif code == MOUSE_CLICK: data = [int(x), int(y), _name(names, a), bool(b)]
+            elif code == MOUSE_SCROLL: data = [int(x), int(y), int(a), int(b)]
+            else: data = [_name(names, a)]
+            events.append({'time': t, 'type': EVENT_TYPES[code], 'data': data})
+        return events
+
+    def to_columns(self, records=None):
+        """Returns (records, names) for the binary format without building per-event dicts."""
+        import numpy as np
+        if records is None: records = self.records()
+        columns = np.zeros(len(records), dtype=event_dtype())
+        name_ids, names = {}, []
+        def name_id(obj):
+            i = name_ids.get(obj)
+            if i is None:
+                i = name_ids[obj] = len(names); names.append(str(obj))
+            return i
+        key, button, pressed, dx, dy = [], [], [], [], []
+        for t, code, x, y, a, b in records:
+            is_click, is_scroll = code == MOUSE_CLICK, code == MOUSE_SCROLL
+            key.append(name_id(a) if code in (KEY_PRESS, KEY_RELEASE) else -1)
+            button.append(name_id(a) if is_click else -1)
+            pressed.append(1 if is_click and b else 0)
+            dx.append(int(a) if is_scroll else 0); dy.append(int(b) if is_scroll else 0)
+        if records:
+            times, types, xs, ys = list(zip(*records))[:4]
+            columns['time'] = (np.array(times, dtype=np.int64) - self.start_ns) / 1e9
+            columns['type'] = types
+            columns['x'] = np.array(xs, dtype=np.float64); columns['y'] = np.array(ys, dtype=np.float64)
+            columns['key'] = key; columns['button'] = button; columns['pressed'] = pressed
+            columns['dx'] = dx; columns['dy'] = dy
+        return columns, names
+
+def _merge(mouse, keys):
+    if not keys: return mouse
+    if not mouse: return keys
+    return list(heapq.merge(mouse, keys, key=_timestamp))
+
+def _name(names, obj):
+    name = names.get(obj)
+    if name is None: name = names[obj] = str(obj)
+    return name
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+
+from macro_store import save_event_chunks
+
+JOURNAL_EXT = ".journal"
+FLUSH_INTERVAL = 0.25
+# Records younger than this stay in the buffer for the next batch, so a listener that took its
+# timestamp just before a drain but appended just after cannot end up out of order on disk.
+HOLDBACK_NS = 50_000_000
+
+def journal_path(macro_path): return macro_path + JOURNAL_EXT
+
+class JournalWriter:
+    """Streams a RecordingBuffer to an append-only journal from a background thread.
+
+    Each batch is one JSON line of [time, type, data] triples, flushed and fsynced, so memory
+    stays bounded by one flush interval and a crash loses at most the last batch.
+    """
+    def __init__(self, recording, macro_path, interval=FLUSH_INTERVAL, stats=None):
+        self.recording = recording
+        self.stats = stats
+        self.macro_path = macro_path
+        self.path = journal_path(macro_path)
+        self.interval = interval
+        self.events_written = 0
+        self.error = None
+        self._stop = threading.Event()
+        self._file = open(self.path, "w")
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._write(self.recording.drain(time.monotonic_ns() - HOLDBACK_NS))
+        self._write(self.recording.drain())
+        self._file.close()
+
+    def _write(self, records):
+        if not records or self.error: return
+        start = time.perf_counter_ns()
+        events = self.recording.to_events(records)
+        try:
+            self._file.write(json.dumps([[e['time'], e['type'], e['data']] for e in events]) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.events_written += len(events)
+            if self.stats is not None: self.stats.record_journal_write(time.perf_counter_ns() - start, len(events))
+        except OSError as e:
+            self.error = e
+
+    def stop(self):
+        """Writes the remaining records and closes the journal; the recording must be closed first."""
+        self._stop.set()
+        self._thread.join()
+        if self.error: raise self.error
+
+def read_journal(path):
+    """Yields each batch of a journal as event dicts, stopping at a half-written last line."""
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                batch = json.loads(line)
+            except json.JSONDecodeError:
+                return
+            yield [{'time': t, 'type': event_type, 'data': data} for t, event_type, data in batch]
+
+def finalize_journal(path, macro_path=None):
+    """Compacts a journal into its macro file in the normal format and removes the journal."""
+    macro_path = macro_path or path[:-len(JOURNAL_EXT)]
+    save_event_chunks(macro_path, read_journal(path))
+    os.remove(path)
+    return macro_path
+
+def recover_journals(folder):
+    """Finalizes journals left behind by a crash. Returns (recovered paths, failures)."""
+    recovered, failed = [], []
+    for file_name in sorted(os.listdir(folder)):
+        if not file_name.endswith(JOURNAL_EXT): continue
+        try: recovered.append(finalize_journal(os.path.join(folder, file_name)))
+        except (OSError, ValueError, KeyError) as e: failed.append((file_name, str(e)))
+    return recovered, failed
@@ -0,0 +1,37 @@
+import numpy as np
+
+from macro_plan import Plan, MOVE
+
+def resample_plan(plan, rate_hz):
+    """Resamples every run of consecutive moves in a plan to a fixed rate.
+
+    Each run is re-sampled on a rate_hz grid from its first to its last move, with positions
+    linearly interpolated along the recorded path; the last move of a run is always kept and
+    samples that would not move the cursor are dropped. Clicks, keys and scrolls keep their
+    original times. Returns plan unchanged if rate_hz is 0.
+    """
+    steps = plan.steps
+    if not rate_hz or len(steps) < 3: return plan
+    period_ns = 1e9 / rate_hz
+    offsets = np.fromiter((s[0] for s in steps), np.int64, len(steps))
+    is_move = np.fromiter((s[1] == MOVE for s in steps), bool, len(steps))
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], is_move, [False])).astype(np.int8)))
+    xs = np.fromiter((s[2] for s in steps), np.float64, len(steps))
+    ys = np.fromiter((s[3] for s in steps), np.float64, len(steps))
+    resampled, copied = [], 0
+    for start, end in zip(edges[0::2].tolist(), edges[1::2].tolist()):
+        t = offsets[start:end]
+        times = np.arange(t[0], t[-1], period_ns)
+        if len(times) + 1 >= end - start: continue  # already sparser than the target rate
+        times = np.append(times, t[-1])
+        x = np.rint(np.interp(times, t, xs[start:end])).astype(np.int64)
+        y = np.rint(np.interp(times, t, ys[start:end])).astype(np.int64)
+        moved = np.ones(len(times), bool)
+        moved[1:] = (x[1:] != x[:-1]) | (y[1:] != y[:-1])
+        moved[-1] = True
+        resampled += steps[copied:start]
+        resampled += [(offset, MOVE, px, py, None) for offset, px, py in
+                      zip(times[moved].astype(np.int64).tolist(), x[moved].tolist(), y[moved].tolist())]
+        copied = end
+    if not copied: return plan
+    return Plan(resampled + steps[copied:])
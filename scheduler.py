@@ -0,0 +1,184 @@
+import heapq
+import itertools
+import threading
+import time
+
+from playback import clamp_speed, histogram_report, SPIN_NS
+from instrumentation import Histogram
+
+RUNNING, PAUSED, CANCELLED, FINISHED = "running", "paused", "cancelled", "finished"
+
+class Playback:
+    """One macro or composition on the scheduler's timeline; use the scheduler's methods to control it.
+
+    Steps are pulled from the plan one at a time and lateness goes into a histogram, so a
+    long-running composition plays in constant memory.
+    """
+    __slots__ = ('id', 'name', 'plan', 'scale', 'priority', 'on_finished', 'state', 'steps', 'step',
+                 'played', 'base_ns', 'paused_ns', 'generation', 'lateness')
+
+    def __init__(self, job_id, name, plan, speed, priority, on_finished):
+        self.id, self.name, self.plan = job_id, name, plan
+        self.scale = 1 / clamp_speed(speed)
+        self.priority = priority
+        self.on_finished = on_finished
+        self.state = RUNNING
+        self.steps = iter(plan.steps)
+        self.step = next(self.steps, None)
+        self.played = 0
+        self.base_ns = self.paused_ns = 0
+        self.generation = 0  # bumped on pause so queue entries from before it are skipped
+        self.lateness = Histogram()
+
+    def deadline(self):
+        return self.base_ns + int(self.step[0] * self.scale)
+
+class PlaybackScheduler:
+    """Plays any number of compiled plans interleaved from a single thread.
+
+    Each active playback has exactly one entry in a heap ordered by (deadline, -priority), so
+    steps from several macros run in deadline order and a higher-priority macro goes first when
+    two are due together. The thread sleeps on a condition until the earliest deadline, spinning
+    only for the last SPIN_NS, so start/pause/cancel wake it and take effect before the next step.
+    on_finished(playback, report) is called without the lock held, from whichever thread ended the playback.
+    """
+    def __init__(self, handler):
+        self.handler = handler
+        self.playbacks = {}
+        self._queue = []
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._finished = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _push(self, playback):
+        heapq.heappush(self._queue, (playback.deadline(), -playback.priority, next(self._seq), playback.generation, playback))
+
+    def start(self, plan, name="", speed=1.0, priority=0, on_finished=None):
+        playback = Playback(next(self._ids), name, plan, speed, priority, on_finished)
+        with self._cond:
+            self.playbacks[playback.id] = playback
+            if playback.step is not None:
+                playback.base_ns = time.monotonic_ns()
+                self._push(playback)
+                self._cond.notify()
+            else: self._finish(playback, FINISHED)
+        self._report_finished()
+        return playback
+
+    def pause(self, playback_id):
+        with self._cond:
+            playback = self.playbacks.get(playback_id)
+            if not playback or playback.state != RUNNING: return False
+            playback.state, playback.paused_ns = PAUSED, time.monotonic_ns()
+            playback.generation += 1
+            self._cond.notify()
+        return True
+
+    def resume(self, playback_id):
+        with self._cond:
+            playback = self.playbacks.get(playback_id)
+            if not playback or playback.state != PAUSED: return False
+            playback.state = RUNNING
+            playback.base_ns += time.monotonic_ns() - playback.paused_ns  # the rest of the macro shifts by the pause
+            self._push(playback)
+            self._cond.notify()
+        return True
+
+    def cancel(self, playback_id):
+        with self._cond:
+            playback = self.playbacks.get(playback_id)
+            if playback: self._finish(playback, CANCELLED)
+            self._cond.notify()
+        self._report_finished()
+        return playback is not None
+
+    def set_priority(self, playback_id, priority):
+        with self._cond:
+            playback = self.playbacks.get(playback_id)
+            if not playback: return False
+            playback.priority = priority
+            if playback.state == RUNNING:
+                playback.generation += 1
+                self._push(playback)
+                self._cond.notify()
+        return True
+
+    def pause_all(self):
+        for playback_id in list(self.playbacks): self.pause(playback_id)
+
+    def resume_all(self):
+        for playback_id in list(self.playbacks): self.resume(playback_id)
+
+    def cancel_all(self):
+        for playback_id in list(self.playbacks): self.cancel(playback_id)
+
+    def active(self):
+        with self._cond: return list(self.playbacks.values())
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.cancel_all()
+        self._thread.join()
+
+    def _finish(self, playback, state):
+        """Removes a playback; the caller holds the condition. Stale queue entries are skipped later."""
+        if self.playbacks.pop(playback.id, None) is None: return
+        playback.state = state
+        playback.generation += 1
+        if playback.on_finished: self._finished.append(playback)
+
+    def _report_finished(self):
+        """Runs on_finished callbacks outside the lock, so they may start or cancel playbacks."""
+        while True:
+            with self._cond:
+                if not self._finished: return
+                playback = self._finished.pop(0)
+            playback.on_finished(playback, histogram_report(playback.lateness))
+
+    def _next_due(self):
+        """Blocks until the earliest live entry is due and pops it, or returns None once closed."""
+        queue = self._queue
+        while True:
+            with self._cond:
+                if self._closed: return None
+                while queue and (queue[0][4].state != RUNNING or queue[0][3] != queue[0][4].generation):
+                    heapq.heappop(queue)
+                if not queue:
+                    self._cond.wait()
+                    continue
+                deadline = queue[0][0]
+                remaining = deadline - time.monotonic_ns()
+                if remaining <= 0: return heapq.heappop(queue)
+                if remaining > SPIN_NS:
+                    self._cond.wait((remaining - SPIN_NS) / 1e9)
+                    continue
+            while time.monotonic_ns() < deadline: pass  # spin unlocked, then re-check the queue head
+
+    def _run(self):
+        inject = self.handler.inject_step
+        while True:
+            entry = self._next_due()
+            if entry is None: return
+            deadline, _, _, generation, playback = entry
+            late = time.monotonic_ns() - deadline
+            playback.lateness.add(max(0, late))
+            step = playback.step
+            try: inject(*step[1:])
+            except Exception as e: print(f"Error playing back step {step}: {e}")
+            stats = self.handler.stats
+            if stats is not None: stats.record_playback(step[1], late, time.monotonic_ns() - deadline - late)
+            next_step = next(playback.steps, None)  # only this thread advances the stream
+            with self._cond:
+                if playback.id not in self.playbacks: continue  # cancelled during the step
+                playback.step, playback.played = next_step, playback.played + 1
+                if next_step is None: self._finish(playback, FINISHED)
+                elif playback.state == RUNNING:
+                    if generation != playback.generation: playback.generation += 1  # a resume or priority change queued the old step
+                    self._push(playback)
+            self._report_finished()
@@ -0,0 +1,106 @@
+"""Headless macro runner: python -m simplemacro play NAME [--repeat N] [--speed X]
+
+NAME may be a recorded macro or a composition (.smc). Folder maintenance runs in parallel with
+python -m simplemacro batch {validate,normalize,convert,simplify,reindex}.
+
+Never imports tkinter; pynput and NumPy are only imported once a command needs them.
+"""
+import time
+_launch_ns = time.monotonic_ns()
+
+import argparse
+import os
+import sys
+
+DEFAULT_FOLDER = "macros_json"
+
+def play(args):
+    import_start = time.monotonic_ns()
+    from composition import find_playable
+    from macro_plan import PlanCache
+    from pynput_handler import PynputHandler
+    from playback import format_report
+    imported = time.monotonic_ns()
+
+    file_path = find_playable(args.folder, args.name)
+    if not os.path.exists(file_path):
+        print(f"No macro named '{args.name}' in {args.folder}.", file=sys.stderr)
+        return 1
+    try:
+        backend = None
+        if args.dry_run:
+            from input_backends import FakeBackend
+            backend = FakeBackend()
+        handler = PynputHandler(listen=False, backend=backend)
+        if args.stats:
+            from instrumentation import Instrumentation
+            handler.stats = Instrumentation()
+        plan = PlanCache(handler.backend, args.resample, args.idle_cap).get(file_path)
+    except (IOError, ValueError) as e:
+        print(f"Cannot load macro: {e}", file=sys.stderr)
+        return 1
+    compiled = time.monotonic_ns()
+    first_event_ns = None
+    for i in range(args.repeat):
+        report = handler.play_plan(plan, args.speed)
+        if first_event_ns is None: first_event_ns = handler.last_start_ns
+        if not args.quiet and report['events']: print(f"Run {i + 1}/{args.repeat}: {report['events']} events, {format_report(report)}")
+    if args.stats:
+        try: handler.stats.export(args.stats)
+        except OSError as e: print(f"Cannot write stats: {e}", file=sys.stderr)
+    if args.profile_startup:
+        ms = lambda ns: ns / 1e6
+        print(f"Startup: interpreter to runner {ms(import_start - _launch_ns):.1f}ms, "
+              f"imports {ms(imported - import_start):.1f}ms, backend+load+compile {ms(compiled - imported):.1f}ms, "
+              f"first event {ms((first_event_ns or compiled) - _launch_ns):.1f}ms after launch")
+    return 0
+
+def batch(args):
+    from batch import run_batch, format_summary, write_report
+    if not os.path.isdir(args.folder):
+        print(f"No macro folder {args.folder}.", file=sys.stderr)
+        return 1
+    options = {'target_ext': ".smb" if args.to == "binary" else ".json",
+               'tolerance_px': args.tolerance_px, 'tolerance_ms': args.tolerance_ms}
+    def progress(done, total):
+        if not args.quiet: print(f"\r{done}/{total} files", end="", file=sys.stderr, flush=True)
+    summary = run_batch(args.folder, args.operation, options, args.workers, progress)
+    if not args.quiet and summary['files']: print(file=sys.stderr)
+    print(format_summary(summary))
+    if args.report:
+        try: write_report(args.report, summary)
+        except OSError as e: print(f"Cannot write report: {e}", file=sys.stderr)
+    return 0 if not summary['failures'] else 2
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="simplemacro", description="Run SimpleMacro macros without the GUI.")
+    parser.add_argument("--folder", default=DEFAULT_FOLDER, help="macro folder (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    play_parser = commands.add_parser("play", help="play a macro")
+    play_parser.add_argument("name")
+    play_parser.add_argument("--repeat", type=int, default=1)
+    play_parser.add_argument("--speed", type=float, default=1.0, help="0.5 to 10 (default: %(default)s)")
+    play_parser.add_argument("--resample", type=int, default=0, metavar="HZ", help="replay mouse motion at a fixed rate, e.g. 60, 120 or 240")
+    play_parser.add_argument("--idle-cap", type=float, default=0, metavar="SECONDS", help="shorten gaps without input to at most SECONDS")
+    play_parser.add_argument("--dry-run", action="store_true", help="play into an in-memory backend instead of the real input devices")
+    play_parser.add_argument("--quiet", action="store_true", help="do not print a timing report per run")
+    play_parser.add_argument("--profile-startup", action="store_true", help="report import and first-event latency")
+    play_parser.add_argument("--stats", metavar="FILE", help="write per-event-type lateness and injection histograms to a .json or .csv file")
+    play_parser.set_defaults(func=play)
+    batch_parser = commands.add_parser("batch", help="validate, normalize, convert, simplify or reindex every macro in the folder in parallel")
+    batch_parser.add_argument("operation", choices=("validate", "normalize", "convert", "simplify", "reindex"))
+    batch_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    batch_parser.add_argument("--to", choices=("binary", "json"), default="binary", help="target format for convert (default: %(default)s)")
+    batch_parser.add_argument("--tolerance-px", type=float, default=2.0, help="simplify tolerance in pixels (default: %(default)s)")
+    batch_parser.add_argument("--tolerance-ms", type=float, default=20.0, help="simplify tolerance in milliseconds (default: %(default)s)")
+    batch_parser.add_argument("--report", metavar="FILE", help="write the per-file results as JSON")
+    batch_parser.add_argument("--quiet", action="store_true", help="do not print progress")
+    batch_parser.set_defaults(func=batch)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
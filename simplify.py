@@ -0,0 +1,57 @@
+import os
+import numpy as np
+
+from macro_store import load_columns, save_columns, save_events, columns_to_events, is_binary, MOUSE_MOVE
+
+def move_runs(types):
+    """Returns (starts, ends) of runs of consecutive mouse moves, ends exclusive."""
+    is_move = np.concatenate(([False], types == MOUSE_MOVE, [False]))
+    edges = np.flatnonzero(is_move[1:] != is_move[:-1])
+    return edges[0::2], edges[1::2]
+
+def simplify_mask(records, tolerance_px=2.0, tolerance_ms=20.0):
+    """Time-aware Ramer-Douglas-Peucker over every run of mouse moves.
+
+    Points are compared in (x, y, t) space with time scaled so that tolerance_ms counts as
+    tolerance_px, so a move is dropped only if the path through its neighbours passes within
+    the spatial tolerance at about the same time. Only mouse moves are ever removed, and the
+    first and last move of each run are always kept. Returns a boolean keep-mask.
+    """
+    keep = np.ones(len(records), dtype=bool)
+    if len(records) < 3: return keep
+    time_scale = tolerance_px / max(tolerance_ms, 1e-6) * 1000.0  # px per second
+    points = np.column_stack((records['x'].astype(np.float64), records['y'].astype(np.float64),
+                              records['time'].astype(np.float64) * time_scale))
+    starts, ends = move_runs(records['type'])
+    stack = [(s, e - 1) for s, e in zip(starts.tolist(), ends.tolist()) if e - s > 2]
+    for s, e in stack: keep[s + 1:e] = False
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2: continue
+        a, b = points[first], points[last]
+        segment = b - a
+        interior = points[first + 1:last] - a
+        length_sq = segment @ segment
+        if length_sq == 0: distances = np.sqrt((interior * interior).sum(axis=1))
+        else:
+            projection = np.clip(interior @ segment / length_sq, 0.0, 1.0)
+            offsets = interior - projection[:, None] * segment
+            distances = np.sqrt((offsets * offsets).sum(axis=1))
+        worst = int(np.argmax(distances))
+        if distances[worst] > tolerance_px:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.append((first, split)); stack.append((split, last))
+    return keep
+
+def simplify_file(file_path, tolerance_px=2.0, tolerance_ms=20.0):
+    """Simplifies a saved macro in place. Returns (events removed, bytes before, bytes after)."""
+    size_before = os.path.getsize(file_path)
+    records, names = load_columns(file_path)
+    keep = simplify_mask(records, tolerance_px, tolerance_ms)
+    removed = int(len(keep) - keep.sum())
+    if removed:
+        records = records[keep]  # copies, releasing the memory map before the file is replaced
+        if is_binary(file_path): save_columns(file_path, records, names)
+        else: save_events(file_path, columns_to_events(records, names))
+    return removed, size_before, os.path.getsize(file_path)
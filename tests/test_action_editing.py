@@ -0,0 +1,58 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pynput")
+tk = pytest.importorskip("tkinter")
+
+from macro_store import save_events
+
+def _key_clicks(keys):
+    events, t = [], 0.0
+    for key in keys:
+        events += [{'time': t, 'type': 'key_press', 'data': [f"'{key}'"]}, {'time': t + 0.05, 'type': 'key_release', 'data': [f"'{key}'"]}]
+        t += 0.2
+    return events
+
+def _pump(app, done, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not done():
+        if time.monotonic() > deadline: raise AssertionError("timed out waiting for the GUI")
+        app.update()
+        time.sleep(0.01)
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    try: tk.Tk().destroy()
+    except tk.TclError: pytest.skip("no display")
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("macros_json")
+    save_events(os.path.join("macros_json", "keys.json"), _key_clicks("abc"))
+    from main import MacroApp
+    app = MacroApp()
+    app.withdraw()
+    _pump(app, lambda: app.macro_listbox.size() == 1)
+    yield app
+    app.on_app_close()
+
+def _select(app):
+    app.macro_listbox.selection_set(0)
+    app.on_macro_select()
+    _pump(app, lambda: len(app.action_rows) == 3)
+
+def test_edits_keep_working_after_the_rows_reload(app):
+    _select(app)
+    path = app.rows_path
+    app.action_tree.selection_set("0")
+    app.delete_treeview_item()
+    _pump(app, lambda: len(app.action_rows) == 2)
+    assert app.rows_path == path
+    assert [row[1] for row in app.action_rows] == ["b", "c"]
+    app.undo_edit()
+    _pump(app, lambda: len(app.action_rows) == 3)
+    assert [row[1] for row in app.action_rows] == ["a", "b", "c"]
+    app.redo_edit()
+    _pump(app, lambda: len(app.action_rows) == 2)
+    assert [row[1] for row in app.action_rows] == ["b", "c"]
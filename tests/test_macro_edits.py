@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from macro_store import save_events, load_columns, edits_path, JSON_EXT, BINARY_EXT
+from macro_edits import MacroEditor, read_edits, load_edited_columns
+
+def _moves(count):
+    return [{'time': 1.0 + i * 0.1, 'type': 'mouse_move', 'data': [i, i]} for i in range(count)]
+
+@pytest.fixture(params=[JSON_EXT, BINARY_EXT])
+def macro(tmp_path, request):
+    path = str(tmp_path / ("m" + request.param))
+    save_events(path, _moves(10))
+    return path
+
+def _xs(editor): return editor.columns()[0]['x'].tolist()
+
+def _times(editor): return np.round(editor.columns()[0]['time'], 6).tolist()
+
+def test_delete_closes_the_gap(macro):
+    editor = MacroEditor(macro)
+    editor.delete([(2, 4), (6, 7)])
+    assert _xs(editor) == [0, 1, 4, 5, 7, 8, 9]
+    assert _times(editor) == [1.0, 1.1, 1.2, 1.3, 1.4, 1.5, 1.6]
+
+def test_move_carries_the_delays(macro):
+    editor = MacroEditor(macro)
+    editor.retime(3, 4, 0.5)
+    editor.move(3, 4, 0)
+    assert _xs(editor) == [3, 0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert _times(editor)[:2] == [1.5, 1.5]
+
+def test_retime_scales_a_group(macro):
+    editor = MacroEditor(macro)
+    editor.retime(0, 5, 2.0)
+    times = _times(editor)
+    assert times[4] - times[0] == pytest.approx(2.0)
+    assert times[5] - times[4] == pytest.approx(0.1)
+
+def test_insert_adds_events_and_names(macro):
+    editor = MacroEditor(macro)
+    editor.insert(2, [{'type': 'key_press', 'data': ["'a'"], 'delay': 0.05},
+                      {'type': 'key_release', 'data': ["'a'"], 'delay': 0.05}])
+    records, names = editor.columns()
+    assert len(records) == 12 and "'a'" in names
+    assert records['key'][2] == records['key'][3] == names.index("'a'")
+
+def test_undo_redo_survive_a_reload(macro):
+    editor = MacroEditor(macro)
+    editor.delete([(0, 1)]); editor.delete([(0, 1)])
+    editor.undo()
+    editor.close()
+    reopened = MacroEditor(macro)
+    assert len(reopened) == 9
+    assert len(reopened.done) == 1 and len(reopened.undone) == 1
+    assert reopened.redo() and len(reopened) == 8
+    reopened.close()
+    assert len(MacroEditor(macro)) == 8
+
+def test_bad_edit_is_not_logged(macro):
+    editor = MacroEditor(macro)
+    with pytest.raises(IndexError): editor.delete([(20, 30)])
+    editor.close()
+    assert read_edits(macro) == ([], [])
+    assert len(editor) == 10
+
+def test_stale_log_is_ignored(macro):
+    editor = MacroEditor(macro)
+    editor.delete([(0, 5)])
+    editor.close()
+    save_events(macro, _moves(3))  # the macro is replaced, e.g. by a new recording
+    os.utime(macro, ns=(1, 1))
+    assert read_edits(macro) == ([], [])
+    assert len(load_edited_columns(macro)[0]) == 3
+
+def test_torn_log_is_rewritten(macro):
+    editor = MacroEditor(macro)
+    editor.delete([(0, 1)])
+    editor.close()
+    with open(edits_path(macro), "a") as f: f.write('{"op": "delete", "ran')  # crash mid-write
+    editor = MacroEditor(macro)
+    assert len(editor) == 9
+    editor.delete([(0, 1)])
+    editor.close()
+    assert len(MacroEditor(macro)) == 8
+
+def test_compact_folds_the_log(macro):
+    editor = MacroEditor(macro)
+    editor.delete([(0, 2)])
+    assert editor.compact()
+    assert not os.path.exists(edits_path(macro))
+    assert len(load_columns(macro)[0]) == 8